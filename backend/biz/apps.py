@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+
+
+class BizConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "biz"
+
+    def ready(self):
+        from core import http_cache
+        from .models import Product, Order
+        http_cache.track(Product, Order)
@@ -0,0 +1,45 @@
+# biz/models.py
+from django.db import models
+from django.utils import timezone
+
+USER_FK = "users.User"
+
+
+class Product(models.Model):
+    owner = models.ForeignKey(USER_FK, on_delete=models.CASCADE, related_name="products", db_index=True)
+    name = models.CharField(max_length=128)
+    price = models.DecimalField(max_digits=12, decimal_places=2)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        # список "своих" товаров: WHERE owner_id = ? ORDER BY id DESC
+        indexes = [models.Index(fields=["owner", "-id"], name="biz_product_owner_id_idx")]
+
+    def __str__(self):
+        return self.name
+
+
+class Order(models.Model):
+    STATUS_NEW = "new"
+    STATUS_PAID = "paid"
+    STATUS_CANCELLED = "cancelled"
+    STATUS_CHOICES = (
+        (STATUS_NEW, "new"),
+        (STATUS_PAID, "paid"),
+        (STATUS_CANCELLED, "cancelled"),
+    )
+
+    owner = models.ForeignKey(USER_FK, on_delete=models.CASCADE, related_name="orders", db_index=True)
+    product = models.ForeignKey(Product, on_delete=models.PROTECT, related_name="orders")
+    quantity = models.PositiveIntegerField(default=1)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_NEW)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["owner", "-id"], name="biz_order_owner_id_idx"),
+            models.Index(fields=["owner", "status"], name="biz_order_owner_status_idx"),
+        ]
+
+    def __str__(self):
+        return f"Order<{self.id}> {self.owner_id}:{self.product_id}"
@@ -0,0 +1,72 @@
+# biz/serializers.py
+from rest_framework import serializers
+from core.permissions_engine import Action, Scope, evaluator_for
+from .models import Product, Order
+
+PRODUCT_RESOURCE = "products"
+
+
+def readable_products(request):
+    """Товары, которые вызывающий может читать: тот же scope, что у ProductViewSet."""
+    qs = Product.objects.all()
+    if request is None:
+        return qs.none()
+    decision = evaluator_for(request).grant(PRODUCT_RESOURCE, Action.READ)
+    if not decision.allowed:
+        return qs.none()
+    if decision.scope == Scope.OWN:
+        qs = qs.filter(owner_id=request.user.id)
+    return qs
+
+
+class ReadableProductField(serializers.PrimaryKeyRelatedField):
+    # чужой и несуществующий товар неразличимы: одинаковая ошибка "does not exist"
+    def get_queryset(self):
+        return readable_products(self.context.get("request")).only("id")
+
+
+class ProductSerializer(serializers.ModelSerializer):
+    owner = serializers.PrimaryKeyRelatedField(read_only=True)
+
+    class Meta:
+        model = Product
+        fields = ("id", "owner", "name", "price", "created_at")
+        read_only_fields = ("id", "owner", "created_at")
+
+
+class OrderSerializer(serializers.ModelSerializer):
+    owner = serializers.PrimaryKeyRelatedField(read_only=True)
+    product = ReadableProductField()
+    product_name = serializers.CharField(source="product.name", read_only=True)
+
+    class Meta:
+        model = Order
+        fields = ("id", "owner", "product", "product_name", "quantity", "status", "created_at")
+        read_only_fields = ("id", "owner", "created_at")
+
+
+class OrderBulkItemSerializer(serializers.ModelSerializer):
+    # id без PrimaryKeyRelatedField: товары проверяются одним запросом на весь пакет
+    product = serializers.IntegerField(source="product_id", min_value=1)
+
+    class Meta:
+        model = Order
+        fields = ("product", "quantity", "status")
+
+
+class OrderBulkSerializer(serializers.Serializer):
+    orders = OrderBulkItemSerializer(many=True, allow_empty=False)
+
+    def __init__(self, *args, max_items: int = 1000, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_items = max_items
+
+    def validate_orders(self, items):
+        if len(items) > self.max_items:
+            raise serializers.ValidationError(f"Too many orders in one batch (max {self.max_items}).")
+        ids = {item["product_id"] for item in items}
+        found = set(readable_products(self.context.get("request")).filter(id__in=ids).values_list("id", flat=True))
+        missing = sorted(ids - found)
+        if missing:
+            raise serializers.ValidationError(f"Unknown products: {missing}")
+        return items
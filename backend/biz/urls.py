@@ -1,7 +1,8 @@
-from django.urls import path
-from .views import ProductView, OrderView
+from rest_framework.routers import DefaultRouter
+from .views import ProductViewSet, OrderViewSet
 
-urlpatterns = [
-    path("products/", ProductView.as_view(), name="products"),
-    path("orders/", OrderView.as_view(), name="orders"),
-]
+router = DefaultRouter()
+router.register(r"products", ProductViewSet, basename="products")
+router.register(r"orders", OrderViewSet, basename="orders")
+
+urlpatterns = router.urls
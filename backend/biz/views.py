@@ -1,39 +1,119 @@
-from rest_framework.views import APIView
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.pagination import CursorPagination
 from rest_framework.response import Response
-from rest_framework import status
-from core.permissions_engine import RBACPermission, Action
+from core import idempotency
+from core.http_cache import ConditionalGetMixin, invalidate
+from core.permissions_engine import RBACPermission, Action, Scope, evaluator_for, map_view_action
 
+from .models import Product, Order
+from .serializers import PRODUCT_RESOURCE, ProductSerializer, OrderSerializer, OrderBulkSerializer
 
-class ProductView(APIView):
-    permission_classes = [RBACPermission]
-    rbac_resource = "products"
-    rbac_action_list = Action.READ
-    rbac_action_create = Action.CREATE
+ORDERS_BULK_MAX = int(getattr(settings, "ORDERS_BULK_MAX", 1000))
 
-    def get(self, request):
-        mock_data = [
-            {"id": 1, "name": "Laptop", "price": 1000},
-            {"id": 2, "name": "Phone", "price": 600},
-        ]
-        return Response(mock_data, status=status.HTTP_200_OK)
 
-    def post(self, request):
-        return Response({"detail": "Product created (mock)"}, status=status.HTTP_201_CREATED)
+class BizCursorPagination(CursorPagination):
+    ordering = "-id"
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 500
 
 
-class OrderView(APIView):
+class OwnerScopedViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
+    """ModelViewSet, у которого own-scope фильтруется в SQL, а не после выборки."""
     permission_classes = [RBACPermission]
+    pagination_class = BizCursorPagination
+    rbac_owner_attr = "owner_id"
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        decision = getattr(self, "rbac_decision", None)
+        if decision is None:
+            action = map_view_action(self, self.request)
+            if action is None:
+                return qs.none()
+            decision = evaluator_for(self.request).grant(self.rbac_resource, action)
+        if not decision.allowed:
+            return qs.none()
+        if decision.scope == Scope.OWN:
+            qs = qs.filter(owner_id=self.request.user.id)
+        return qs
+
+    def perform_create(self, serializer):
+        serializer.save(owner=self.request.user)
+
+
+class ProductViewSet(OwnerScopedViewSet):
+    queryset = Product.objects.all()
+    serializer_class = ProductSerializer
+    etag_models = (Product,)
+    rbac_resource = PRODUCT_RESOURCE
+    rbac_action_list = Action.READ
+    rbac_action_create = Action.CREATE
+
+
+class OrderViewSet(OwnerScopedViewSet):
+    queryset = Order.objects.select_related("product").all()
+    serializer_class = OrderSerializer
+    etag_models = (Order, Product)
     rbac_resource = "orders"
     rbac_action_list = Action.READ
     rbac_action_destroy = Action.DELETE
-    rbac_owner_attr = "owner_id"
+    rbac_action_bulk_create = Action.CREATE
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        status_filter = self.request.query_params.get("status")
+        if status_filter:
+            qs = qs.filter(status=status_filter)
+        return qs
+
+    @action(detail=False, methods=["post"], url_path="bulk")
+    def bulk_create(self, request):
+        """Пакетное создание: одна RBAC-проверка, один INSERT, повтор по Idempotency-Key."""
+        key = request.headers.get("Idempotency-Key")
+        req_hash = None
+        if key:
+            if len(key) > idempotency.IDEMPOTENCY_KEY_MAX_LEN:
+                return Response({"detail": "Idempotency-Key too long"}, status=status.HTTP_400_BAD_REQUEST)
+            req_hash = idempotency.request_hash(request.data)
+            stored = idempotency.lookup(request.user, key)
+            if stored is not None:
+                return self._replay(stored, req_hash)
 
-    def get(self, request):
-        mock_orders = [
-            {"id": 101, "product": "Laptop", "owner": request.user.email},
-            {"id": 102, "product": "Phone", "owner": request.user.email},
-        ]
-        return Response(mock_orders, status=status.HTTP_200_OK)
+        serializer = OrderBulkSerializer(
+            data=request.data, max_items=ORDERS_BULK_MAX, context=self.get_serializer_context(),
+        )
+        serializer.is_valid(raise_exception=True)
+        objs = [Order(owner=request.user, **item) for item in serializer.validated_data["orders"]]
+        try:
+            with transaction.atomic():
+                Order.objects.bulk_create(objs)
+                body = {"created": len(objs), "ids": [o.id for o in objs]}
+                if key:
+                    idempotency.store(request.user, key, req_hash, status.HTTP_201_CREATED, body)
+        except IntegrityError:
+            # параллельный повтор с тем же ключом успел закоммитить первым
+            stored = idempotency.lookup(request.user, key) if key else None
+            if stored is not None:
+                return self._replay(stored, req_hash)
+            # иначе ошибка в данных: например, товар удалили между проверкой и вставкой
+            ids = {o.product_id for o in objs}
+            missing = sorted(ids - set(Product.objects.filter(id__in=ids).values_list("id", flat=True)))
+            if missing:
+                return Response({"orders": [f"Unknown products: {missing}"]}, status=status.HTTP_400_BAD_REQUEST)
+            return Response(
+                {"detail": "Conflicting concurrent change, retry the request"}, status=status.HTTP_409_CONFLICT,
+            )
+        invalidate(Order)
+        return Response(body, status=status.HTTP_201_CREATED)
 
-    def delete(self, request, order_id=None):
-        return Response({"detail": f"Order {order_id} deleted (mock)"}, status=status.HTTP_200_OK)
\ No newline at end of file
+    def _replay(self, stored, req_hash: str) -> Response:
+        if stored.request_hash != req_hash:
+            return Response(
+                {"detail": "Idempotency-Key was already used with a different payload"},
+                status=status.HTTP_409_CONFLICT,
+            )
+        return Response(stored.response, status=stored.status_code, headers={"Idempotent-Replayed": "true"})
@@ -0,0 +1,7 @@
+import os
+from django.core.asgi import get_asgi_application
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+application = get_asgi_application()
+
+# без хуков gunicorn прогрева нет: ресурсы создаёт `manage.py sync_resources` при деплое,
+# кеши RBAC заполняются по первым запросам
@@ -10,12 +10,12 @@ DEBUG = True
 STATIC_URL = "/static/"
 ALLOWED_HOSTS = os.getenv('ALLOWED_HOSTS', '127.0.0.1,localhost').split(',')
 
+# API-профиль: request.user выставляет только core.middleware.AuthMiddleware (свои Session/JWT),
+# поэтому django.contrib.sessions/messages/admin, их middleware и CSRF-middleware не подключены
+# (APIView DRF и так csrf_exempt). Полный стек Django — config.settings_full.
 INSTALLED_APPS = [
-    "django.contrib.admin",
     "django.contrib.auth",
     "django.contrib.contenttypes",
-    "django.contrib.sessions",
-    "django.contrib.messages",
     "django.contrib.staticfiles",
     "rest_framework", 
     "core", 
@@ -25,12 +25,12 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "core.profiling.ProfilingMiddleware",  # выключен, пока PROFILING_ENABLED=False
+    "core.logging_pipeline.RequestIdMiddleware",
+    "core.admission.AdmissionMiddleware",  # сброс нагрузки до любой работы с БД
+    "core.db_router.ReplicaPinMiddleware",
     "django.middleware.security.SecurityMiddleware",
-    "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
-    "django.middleware.csrf.CsrfViewMiddleware",
-    "django.contrib.auth.middleware.AuthenticationMiddleware",
-    "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "core.middleware.AuthMiddleware",
 ]
@@ -45,7 +45,6 @@ TEMPLATES = [{
         "django.template.context_processors.debug",
         "django.template.context_processors.request",
         "django.contrib.auth.context_processors.auth",
-        "django.contrib.messages.context_processors.messages",
     ]},
 }]
 
@@ -59,8 +58,24 @@ DATABASES = {
         "PASSWORD": os.getenv("DB_PASSWORD","authpass"),
         "HOST": os.getenv("DB_HOST","localhost"),
         "PORT": os.getenv("DB_PORT","5433"),
+        # постоянные соединения: на них держатся prepared statements core.hot_queries
+        "CONN_MAX_AGE": int(os.getenv("DB_CONN_MAX_AGE", "60")),
+        "CONN_HEALTH_CHECKS": True,
     }
 }
+# PREPARE/EXECUTE для запросов auth/RBAC; False — за pgbouncer в transaction-режиме
+PREPARED_STATEMENTS = os.getenv("DB_PREPARED_STATEMENTS", "True") == "True"
+
+# Реплики для запросов горячего пути auth/RBAC (core.hot_queries, core.db_router): DB_REPLICAS="host1:5432,host2:5432".
+# Для локальной проверки достаточно указать тот же сервер: DB_REPLICAS=localhost:5433
+REPLICA_DATABASES = []
+for _i, _hostport in enumerate(filter(None, os.getenv("DB_REPLICAS", "").split(",")), start=1):
+    _host, _, _port = _hostport.strip().partition(":")
+    _alias = f"replica{_i}"
+    DATABASES[_alias] = dict(DATABASES["default"], HOST=_host, PORT=_port or DATABASES["default"]["PORT"], TEST={"MIRROR": "default"})
+    REPLICA_DATABASES.append(_alias)
+DATABASE_ROUTERS = ["core.db_router.ReplicaRouter"]
+REPLICA_STICKY_SECONDS = int(os.getenv("REPLICA_STICKY_SECONDS", "10"))  # окно чтения из primary после записи
 
 AUTH_PASSWORD_VALIDATORS = []
 LANGUAGE_CODE = "ru-ru"
@@ -75,40 +90,114 @@ REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": [],
 }
 
+# Версии данных для ETag (core.http_cache) хранятся здесь: при нескольких воркерах
+# нужен общий backend (memcached/redis), иначе инвалидация видна только своему процессу.
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.getenv("CACHE_LOCATION", ""),
+    }
+}
+SHARED_CACHE_ALIAS = "default"
+ETAG_BODY_CACHE_SIZE = int(os.getenv("ETAG_BODY_CACHE_SIZE", "256"))  # 0 — не кешировать тела
+# С LocMemCache условные GET включаются только явно и только для одного процесса
+# (gunicorn.conf.py не запустит больше одного воркера)
+ETAG_SINGLE_PROCESS = os.getenv("ETAG_SINGLE_PROCESS", "False") == "True"
+
+# Скользящие сессии (core.session_activity): продление не чаще раза в SESSION_TOUCH_INTERVAL_MIN,
+# запись в БД — одним UPDATE на буфер раз в SESSION_FLUSH_INTERVAL_SEC
+SESSION_SLIDING = os.getenv("SESSION_SLIDING", "True") == "True"
+SESSION_TOUCH_INTERVAL_MIN = int(os.getenv("SESSION_TOUCH_INTERVAL_MIN", "5"))
+SESSION_FLUSH_INTERVAL_SEC = float(os.getenv("SESSION_FLUSH_INTERVAL_SEC", "30"))
+# Лимит активных сессий на пользователя; при превышении вытесняются самые старые (0 — без лимита)
+SESSION_MAX_PER_USER = int(os.getenv("SESSION_MAX_PER_USER", "20"))
+
+# Максимум проверок в одном POST /api/rbac/check
+RBAC_CHECK_MAX_ITEMS = int(os.getenv("RBAC_CHECK_MAX_ITEMS", "5000"))
+
+# rbac.registry.warmup() из хуков gunicorn.conf.py: досоздать Resource из rbac_resource во view и прогреть кеши RBAC
+RBAC_WARMUP = os.getenv("RBAC_WARMUP", "True") == "True"
+# как часто воркер сверяет версию политики в общем кеше (изменения из других процессов)
+RBAC_CACHE_CHECK_SEC = float(os.getenv("RBAC_CACHE_CHECK_SEC", "1.0"))
+
+# core.admission: лимиты одновременных запросов на воркер по классам (auth = вход/регистрация с bcrypt)
+# и цели латентности; сверх лимита — короткая очередь, затем 503 + Retry-After
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "False") == "True"
+ADMISSION_LIMITS = {
+    "auth": int(os.getenv("ADMISSION_LIMIT_AUTH", "2")),
+    "write": int(os.getenv("ADMISSION_LIMIT_WRITE", "16")),
+    "read": int(os.getenv("ADMISSION_LIMIT_READ", "32")),
+}
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "16"))
+ADMISSION_QUEUE_TIMEOUT_MS = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_MS", "200"))
+ADMISSION_LATENCY_TARGET_MS = {"auth": 2000, "write": 1000, "read": 500}
+ADMISSION_LOW_PRIORITY = ("auth",)  # отклоняются сразу, пока латентность любого класса выше цели
+ADMISSION_RETRY_AFTER = int(os.getenv("ADMISSION_RETRY_AFTER", "2"))
+# сколько запрос может ждать перед воркером (по X-Request-Start от прокси); 0 — не проверять
+ADMISSION_MAX_QUEUE_MS = float(os.getenv("ADMISSION_MAX_QUEUE_MS", "0"))
+# перегрузка — только если EWMA выше цели дольше ADMISSION_BREACH_SEC и после простоя набрано
+# не меньше ADMISSION_MIN_SAMPLES замеров: один медленный запрос не отключает вход
+ADMISSION_MIN_SAMPLES = int(os.getenv("ADMISSION_MIN_SAMPLES", "20"))
+ADMISSION_BREACH_SEC = float(os.getenv("ADMISSION_BREACH_SEC", "1.0"))
+
+# core.policy_store: снимок RBAC-политики, общий для воркеров (mmap); "" — у каждого процесса свои кеши.
+# Каталог — только владельца (0700), иначе снимок не используется
+# "auto": /dev/shm/rbac-policy-<uid>/<хеш HOST, PORT, NAME базы и модуля настроек>.bin (core.policy_store)
+RBAC_POLICY_STORE = os.getenv("RBAC_POLICY_STORE", "auto" if os.path.isdir("/dev/shm") else "")
+RBAC_POLICY_STORE_CHECK_SEC = float(os.getenv("RBAC_POLICY_STORE_CHECK_SEC", "1.0"))
+# пересборка снимка — в фоновом потоке, изменения за это окно дают одну публикацию
+RBAC_POLICY_STORE_PUBLISH_DELAY = float(os.getenv("RBAC_POLICY_STORE_PUBLISH_DELAY", "0.2"))
+
+# core.profiling: фазы запроса, SQL, N+1; пишет медленные/семплированные запросы в лог
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "False") == "True"
+PROFILING_SLOW_MS = float(os.getenv("PROFILING_SLOW_MS", "500"))
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", "0.0"))
+
+
+# Логи пишутся через очередь (core.logging_pipeline): на потоке запроса — только put_nowait,
+# JSON-форматирование и запись в файл/консоль — в отдельном потоке QueueListener.
+LOG_QUEUE_MAXSIZE = int(os.getenv("LOG_QUEUE_MAXSIZE", "10000"))
 
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
-    "formatters": {
-        "simple": {"format": "%(asctime)s [%(levelname)s] %(name)s: %(message)s"},
+    "filters": {
+        "request_id": {"()": "core.logging_pipeline.RequestIdFilter"},
+        # auth-логи на каждый запрос: DEBUG — 1%, INFO — 10%, WARNING+ — все
+        "auth_sampling": {
+            "()": "core.logging_pipeline.LevelSamplingFilter",
+            "rates": {"DEBUG": float(os.getenv("LOG_AUTH_DEBUG_SAMPLE", "0.01")), "INFO": 0.1},
+        },
     },
     "handlers": {
-        "console": {
-            "class": "logging.StreamHandler",
-            "level": "DEBUG",              # важное место
-            "formatter": "simple",
-        },
-        "file": {
-            "class": "logging.FileHandler",
-            "level": "DEBUG",              # важное место
+        "queue": {
+            "()": "core.logging_pipeline.build_queue_handler",
+            "level": "DEBUG",
+            "filters": ["request_id"],
             "filename": BASE_DIR / "debug.log",
-            "formatter": "simple",
+            "maxsize": LOG_QUEUE_MAXSIZE,
         },
     },
     "loggers": {
         "core.middleware": {               # имя должно совпадать с __name__ в файле
-            "handlers": ["console", "file"],
+            "handlers": ["queue"],
             "level": "DEBUG",
+            "filters": ["auth_sampling"],
+            "propagate": False,
+        },
+        "core.profiling": {
+            "handlers": ["queue"],
+            "level": "INFO",
             "propagate": False,
         },
         "django": {
-            "handlers": ["console"],
+            "handlers": ["queue"],
             "level": "INFO",
-            "propagate": True,
+            "propagate": False,
         },
         "": {  # root-логгер, на всякий случай
-            "handlers": ["console"],
+            "handlers": ["queue"],
             "level": "WARNING",
         },
     },
-}
\ No newline at end of file
+}
@@ -0,0 +1,27 @@
+# Полный стек Django (admin, django.contrib.sessions, messages, CSRF) поверх API-профиля:
+# DJANGO_SETTINGS_MODULE=config.settings_full
+from .settings import *  # noqa: F401,F403
+from .settings import INSTALLED_APPS, MIDDLEWARE, TEMPLATES
+
+INSTALLED_APPS = [
+    "django.contrib.admin",
+    "django.contrib.sessions",
+    "django.contrib.messages",
+    *INSTALLED_APPS,
+]
+
+_auth = MIDDLEWARE.index("core.middleware.AuthMiddleware")
+MIDDLEWARE = [
+    *MIDDLEWARE[:_auth],
+    "django.contrib.sessions.middleware.SessionMiddleware",
+    "django.middleware.csrf.CsrfViewMiddleware",
+    "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "django.contrib.messages.middleware.MessageMiddleware",
+    # последним: перекрывает request.user, выставленный AuthenticationMiddleware
+    *MIDDLEWARE[_auth:],
+]
+
+TEMPLATES = [dict(TEMPLATES[0], OPTIONS={"context_processors": [
+    *TEMPLATES[0]["OPTIONS"]["context_processors"],
+    "django.contrib.messages.context_processors.messages",
+]})]
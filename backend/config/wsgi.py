@@ -2,3 +2,5 @@ import os
 from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings") 
 application = get_wsgi_application()
+
+# прогрев RBAC (rbac.registry.warmup) — в хуках gunicorn.conf.py, а не при импорте модуля
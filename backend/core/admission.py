@@ -0,0 +1,231 @@
+# core/admission.py
+"""
+Admission control: ограничение одновременных запросов в воркере и сброс нагрузки.
+
+Запросы делятся на классы: "auth" (bcrypt: вход и регистрация), "write" и "read".
+У каждого класса свой лимит одновременных запросов и короткая очередь ожидания.
+По каждому классу считается скользящая (EWMA) латентность. Если хотя бы у одного класса
+она держится выше цели дольше ADMISSION_BREACH_SEC (и набрано не меньше ADMISSION_MIN_SAMPLES
+замеров после простоя), воркер считается перегруженным: классы из ADMISSION_LOW_PRIORITY
+отклоняются сразу, без ожидания. Один медленный запрос перегрузку не включает.
+
+По умолчанию выключено (ADMISSION_ENABLED=False): лимиты надо подбирать под число потоков воркера.
+
+Очередь перед воркером (backlog сокета) middleware не видит; если прокси ставит
+X-Request-Start (nginx: `proxy_set_header X-Request-Start "t=${msec}"`), время ожидания
+в ней входит в латентность, а запросы старше ADMISSION_MAX_QUEUE_MS отклоняются сразу.
+
+Отказ — 503 с Retry-After до AuthMiddleware, то есть без единого запроса к БД.
+Счётчики admitted / queued / shed по классам — admission.stats() (на процесс).
+"""
+import logging
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import JsonResponse
+
+logger = logging.getLogger(__name__)
+
+ADMISSION_ENABLED = bool(getattr(settings, "ADMISSION_ENABLED", False))
+ADMISSION_EXPENSIVE_PATHS = tuple(getattr(settings, "ADMISSION_EXPENSIVE_PATHS", ("/api/users/login/", "/api/users/register/")))
+ADMISSION_LIMITS: Dict[str, int] = dict(getattr(settings, "ADMISSION_LIMITS", {"auth": 2, "write": 16, "read": 32}))
+ADMISSION_QUEUE_SIZE = int(getattr(settings, "ADMISSION_QUEUE_SIZE", 16))
+ADMISSION_QUEUE_TIMEOUT_MS = float(getattr(settings, "ADMISSION_QUEUE_TIMEOUT_MS", 200))
+ADMISSION_LATENCY_TARGET_MS: Dict[str, float] = dict(
+    getattr(settings, "ADMISSION_LATENCY_TARGET_MS", {"auth": 2000, "write": 1000, "read": 500})
+)
+ADMISSION_LOW_PRIORITY = tuple(getattr(settings, "ADMISSION_LOW_PRIORITY", ("auth",)))
+ADMISSION_RETRY_AFTER = int(getattr(settings, "ADMISSION_RETRY_AFTER", 2))
+ADMISSION_MAX_QUEUE_MS = float(getattr(settings, "ADMISSION_MAX_QUEUE_MS", 0))  # 0 — не проверять
+ADMISSION_MIN_SAMPLES = int(getattr(settings, "ADMISSION_MIN_SAMPLES", 20))
+ADMISSION_BREACH_SEC = float(getattr(settings, "ADMISSION_BREACH_SEC", 1.0))
+
+ROUTE_CLASSES = ("auth", "write", "read")
+_READ_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+def upstream_queue_ms(request) -> float:
+    """Ожидание до воркера по X-Request-Start (секунды, миллисекунды или микросекунды epoch)."""
+    raw = request.META.get("HTTP_X_REQUEST_START", "")
+    if not raw:
+        return 0.0
+    try:
+        value = float(raw[2:] if raw.startswith("t=") else raw)
+    except ValueError:
+        return 0.0
+    if value > 1e14:
+        value /= 1e6
+    elif value > 1e11:
+        value /= 1e3
+    return max(0.0, (time.time() - value) * 1000)
+
+
+def route_class(request) -> str:
+    if request.method == "POST" and request.path_info.startswith(ADMISSION_EXPENSIVE_PATHS):
+        return "auth"
+    return "read" if request.method in _READ_METHODS else "write"
+
+
+class AdmissionController:
+    """Состояние одного воркера; потокобезопасно (gthread)."""
+
+    EWMA_ALPHA = 0.2
+    # без завершённых запросов дольше этого латентность не учитывается, счёт замеров начинается заново
+    LATENCY_WINDOW_SEC = 5.0
+
+    def __init__(
+        self,
+        limits: Dict[str, int],
+        queue_size: int,
+        queue_timeout_ms: float,
+        latency_target_ms: Dict[str, float],
+        low_priority: Iterable[str] = (),
+        max_queue_ms: float = 0,
+        min_samples: int = 20,
+        breach_sec: float = 1.0,
+    ):
+        self.limits = dict(limits)
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout_ms / 1000
+        self.latency_target = dict(latency_target_ms)
+        self.low_priority = frozenset(low_priority)
+        self.max_queue_ms = max_queue_ms
+        self.min_samples = min_samples
+        self.breach_sec = breach_sec
+        self._cond = threading.Condition()
+        self._in_flight = dict.fromkeys(ROUTE_CLASSES, 0)
+        self._waiting = dict.fromkeys(ROUTE_CLASSES, 0)
+        self._latency_ms = dict.fromkeys(ROUTE_CLASSES, 0.0)
+        self._latency_at = dict.fromkeys(ROUTE_CLASSES, 0.0)
+        self._samples = dict.fromkeys(ROUTE_CLASSES, 0)
+        # с какого момента EWMA выше цели (None — не выше)
+        self._breach_since: Dict[str, Optional[float]] = dict.fromkeys(ROUTE_CLASSES, None)
+        self._counters = {cls: {"admitted": 0, "queued": 0, "shed": 0} for cls in ROUTE_CLASSES}
+
+    @classmethod
+    def from_settings(cls) -> "AdmissionController":
+        return cls(
+            ADMISSION_LIMITS, ADMISSION_QUEUE_SIZE, ADMISSION_QUEUE_TIMEOUT_MS,
+            ADMISSION_LATENCY_TARGET_MS, ADMISSION_LOW_PRIORITY, ADMISSION_MAX_QUEUE_MS,
+            ADMISSION_MIN_SAMPLES, ADMISSION_BREACH_SEC,
+        )
+
+    def _has_slot(self, cls: str) -> bool:
+        limit = self.limits.get(cls)
+        return limit is None or self._in_flight[cls] < limit
+
+    def overloaded(self) -> bool:
+        now = time.monotonic()
+        for cls in self.latency_target:
+            since = self._breach_since[cls]
+            if (
+                since is not None
+                and now - since >= self.breach_sec
+                and self._samples[cls] >= self.min_samples
+                and now - self._latency_at[cls] < self.LATENCY_WINDOW_SEC
+            ):
+                return True
+        return False
+
+    def acquire(self, cls: str, queued_ms: float = 0.0) -> bool:
+        with self._cond:
+            counters = self._counters[cls]
+            # клиент, скорее всего, уже не ждёт ответа
+            if self.max_queue_ms and queued_ms > self.max_queue_ms:
+                counters["shed"] += 1
+                return False
+            if cls in self.low_priority and self.overloaded():
+                counters["shed"] += 1
+                return False
+            if self._has_slot(cls):
+                self._in_flight[cls] += 1
+                counters["admitted"] += 1
+                return True
+            if self._waiting[cls] >= self.queue_size or self.queue_timeout <= 0:
+                counters["shed"] += 1
+                return False
+            counters["queued"] += 1
+            self._waiting[cls] += 1
+            try:
+                admitted = self._cond.wait_for(lambda: self._has_slot(cls), timeout=self.queue_timeout)
+            finally:
+                self._waiting[cls] -= 1
+            if not admitted:
+                counters["shed"] += 1
+                return False
+            self._in_flight[cls] += 1
+            counters["admitted"] += 1
+            return True
+
+    def release(self, cls: str, elapsed_ms: float) -> None:
+        with self._cond:
+            self._in_flight[cls] -= 1
+            now = time.monotonic()
+            if now - self._latency_at[cls] >= self.LATENCY_WINDOW_SEC:
+                # после простоя: старое значение лишь затухает, перегрузку снова подтверждают замеры
+                self._samples[cls] = 0
+                self._breach_since[cls] = None
+            prev = self._latency_ms[cls]
+            self._latency_ms[cls] = prev + self.EWMA_ALPHA * (elapsed_ms - prev)
+            self._latency_at[cls] = now
+            self._samples[cls] += 1
+            target = self.latency_target.get(cls)
+            if target is not None and self._latency_ms[cls] > target:
+                if self._breach_since[cls] is None:
+                    self._breach_since[cls] = now
+            else:
+                self._breach_since[cls] = None
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, dict]:
+        with self._cond:
+            return {
+                cls: dict(
+                    self._counters[cls],
+                    in_flight=self._in_flight[cls],
+                    waiting=self._waiting[cls],
+                    latency_ms=round(self._latency_ms[cls], 1),
+                )
+                for cls in ROUTE_CLASSES
+            }
+
+
+controller: Optional[AdmissionController] = None
+
+
+def stats() -> Dict[str, dict]:
+    return controller.stats() if controller is not None else {}
+
+
+def overloaded_response() -> JsonResponse:
+    response = JsonResponse({"detail": "Service overloaded, retry later"}, status=503)
+    response["Retry-After"] = str(ADMISSION_RETRY_AFTER)
+    return response
+
+
+class AdmissionMiddleware:
+    """Ставится до AuthMiddleware: отказ не стоит ни одного запроса к БД."""
+
+    def __init__(self, get_response, admission: Optional[AdmissionController] = None):
+        global controller
+        if admission is None and not ADMISSION_ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.controller = admission or AdmissionController.from_settings()
+        if admission is None:
+            controller = self.controller
+
+    def __call__(self, request):
+        cls = route_class(request)
+        queued_ms = upstream_queue_ms(request)
+        if not self.controller.acquire(cls, queued_ms):
+            logger.debug("admission: shed %s %s (%s)", request.method, request.path_info, cls)
+            return overloaded_response()
+        started = time.perf_counter()
+        try:
+            return self.get_response(request)
+        finally:
+            self.controller.release(cls, queued_ms + (time.perf_counter() - started) * 1000)
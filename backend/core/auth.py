@@ -1,10 +1,11 @@
 
+import hashlib
 import secrets
 import bcrypt
 import jwt
 import uuid
 from datetime import timedelta, datetime
-from typing import Optional, Tuple, Dict, Any
+from typing import Optional, Tuple, Dict, Any, List
 
 from django.conf import settings
 from django.utils import timezone
@@ -13,13 +14,18 @@ from django.http import HttpResponse
 from rest_framework.authentication import BaseAuthentication
 from django.contrib.auth.models import AnonymousUser
 
-from core.models import Session, RevokedToken
+from django.db import DEFAULT_DB_ALIAS, connections, router, transaction
+
+from core.db_router import mark_written, pinned, primary, is_pinned
+from core import hot_queries, session_activity
+from core.models import Session, RevokedToken, RefreshFamily
 from users.models import User
 
 JWT_ALGORITHM = getattr(settings, "JWT_ALGORITHM", "HS256")
 JWT_ACCESS_TTL_MIN = int(getattr(settings, "JWT_ACCESS_TTL_MIN", 15))
 JWT_REFRESH_TTL_MIN = int(getattr(settings, "JWT_REFRESH_TTL_MIN", 60 * 24 * 30))
 SESSION_TTL_MIN = int(getattr(settings, "SESSION_TTL_MIN", 60 * 24 * 30))
+SESSION_MAX_PER_USER = int(getattr(settings, "SESSION_MAX_PER_USER", 20))  # 0 — без ограничения
 SESSION_COOKIE_NAME = getattr(settings, "SESSION_COOKIE_NAME", "sessionid")
 SESSION_COOKIE_SECURE = getattr(settings, "SESSION_COOKIE_SECURE", True)
 SESSION_COOKIE_HTTPONLY = getattr(settings, "SESSION_COOKIE_HTTPONLY", True)
@@ -52,7 +58,13 @@ def _now_utc() -> datetime:
     return datetime.utcnow()
 
 
-def make_jwt(user_id: int, minutes: int = JWT_ACCESS_TTL_MIN, typ: str = "access") -> str:
+def make_jwt(
+    user_id: int,
+    minutes: int = JWT_ACCESS_TTL_MIN,
+    typ: str = "access",
+    jti: Optional[uuid.UUID] = None,
+    family: Optional[uuid.UUID] = None,
+) -> str:
     iat = _now_utc()
     exp = iat + timedelta(minutes=int(minutes))
     payload = {
@@ -60,8 +72,10 @@ def make_jwt(user_id: int, minutes: int = JWT_ACCESS_TTL_MIN, typ: str = "access
         "typ": typ,
         "iat": int(iat.timestamp()),
         "exp": int(exp.timestamp()),
-        "jti": str(uuid.uuid4()),
+        "jti": str(jti or uuid.uuid4()),
     }
+    if family is not None:
+        payload["fam"] = str(family)
     token = jwt.encode(payload, settings.SECRET_KEY, algorithm=JWT_ALGORITHM)
     return token
 
@@ -80,25 +94,124 @@ def parse_jwt(token: str) -> Dict[str, Any]:
 
 
 def make_access_and_refresh(user_id: int) -> Tuple[str, str]:
+    """Пара токенов после входа по паролю: refresh открывает новое семейство ротаций."""
+    family, jti = uuid.uuid4(), uuid.uuid4()
+    RefreshFamily.objects.create(
+        id=family, user_id=user_id, current_jti=jti, expire_at=timezone.now() + timedelta(minutes=JWT_REFRESH_TTL_MIN),
+    )
+    return _issue_pair(user_id, family, jti)
+
+
+def _issue_pair(user_id: int, family: uuid.UUID, jti: uuid.UUID) -> Tuple[str, str]:
     access = make_jwt(user_id, minutes=JWT_ACCESS_TTL_MIN, typ="access")
-    refresh = make_jwt(user_id, minutes=JWT_REFRESH_TTL_MIN, typ="refresh")
+    refresh = make_jwt(user_id, minutes=JWT_REFRESH_TTL_MIN, typ="refresh", jti=jti, family=family)
     return access, refresh
 
 
+def rotate_refresh(token: str) -> Tuple[str, str]:
+    """Меняет refresh-токен на новую пару без проверки пароля.
+
+    Действителен только последний refresh семейства: повторное предъявление уже
+    использованного означает утечку, и семейство удаляется целиком.
+    """
+    payload = parse_jwt(token)
+    if payload.get("typ") != "refresh":
+        raise AuthError("invalid_token_type")
+    family, jti = _jti_uuid(payload.get("fam")), _jti_uuid(payload.get("jti"))
+    if family is None or jti is None:
+        raise AuthError("invalid_token")
+    user_id = int(payload["sub"])
+    new_jti = uuid.uuid4()
+    now = timezone.now()
+    # compare-and-swap одним UPDATE: из двух параллельных ротаций пройдёт одна
+    rotated = RefreshFamily.objects.filter(id=family, user_id=user_id, current_jti=jti, expire_at__gt=now).update(
+        current_jti=new_jti, expire_at=now + timedelta(minutes=JWT_REFRESH_TTL_MIN),
+    )
+    if not rotated:
+        reused, _ = RefreshFamily.objects.filter(id=family).exclude(current_jti=jti).delete()
+        raise AuthError("token_reused" if reused else "token_revoked")
+    if not User.objects.filter(pk=user_id, is_active=True).exists():
+        RefreshFamily.objects.filter(id=family).delete()
+        raise AuthError("invalid_user")
+    return _issue_pair(user_id, family, new_jti)
+
+
+def revoke_refresh(token: str) -> None:
+    """Закрывает семейство refresh-токена (logout); невалидный токен игнорируется."""
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[JWT_ALGORITHM], options={"verify_exp": False})
+    except jwt.InvalidTokenError:
+        return
+    family = _jti_uuid(payload.get("fam"))
+    if family is not None and payload.get("typ") == "refresh":
+        RefreshFamily.objects.filter(id=family, user_id=payload.get("sub")).delete()
+
+
+def purge_expired_refresh_families() -> int:
+    deleted, _ = RefreshFamily.objects.filter(expire_at__lte=timezone.now()).delete()
+    return deleted
+
+
+def _jti_uuid(jti: str) -> Optional[uuid.UUID]:
+    try:
+        return uuid.UUID(str(jti))
+    except ValueError:
+        return None
+
+
 def revoke_jwt(jti: str, exp_timestamp: int) -> None:
+    key = _jti_uuid(jti)
+    if key is None:
+        return
     try:
         exp_dt = datetime.fromtimestamp(int(exp_timestamp), tz=timezone.utc)
     except Exception:
         exp_dt = timezone.now()
-    RevokedToken.objects.get_or_create(jti=jti, defaults={"exp": exp_dt})
+    RevokedToken.objects.get_or_create(jti=key, defaults={"exp": exp_dt})
+    mark_written(f"jti:{key}")
 
 
 def is_jwt_revoked(jti: str) -> bool:
-    return RevokedToken.objects.filter(jti=jti).exists()
+    key = _jti_uuid(jti)
+    if key is None:
+        # такой jti не мог попасть в RevokedToken
+        return False
+    with pinned(f"jti:{key}"):
+        return hot_queries.jti_revoked(key)
+
+
+def session_digest(session_id: str) -> bytes:
+    """Ключ строки Session: в БД лежит только sha256 от значения cookie."""
+    return hashlib.sha256(session_id.encode("utf-8")).digest()
+
+
+def _evict_excess_sessions(user_id: int, keep: int) -> List[bytes]:
+    """Удаляет сессии пользователя сверх keep самых новых; возвращает их ключи."""
+    alias = router.db_for_write(Session)
+    conn = connections[alias]
+    if conn.vendor == "postgresql":
+        table = conn.ops.quote_name(Session._meta.db_table)
+        # один statement: подзапрос идёт по индексу (user, -created_at)
+        sql = (
+            f"DELETE FROM {table} WHERE id IN ("
+            f"SELECT id FROM {table} WHERE user_id = %s ORDER BY created_at DESC, id DESC OFFSET %s"
+            f") RETURNING id"
+        )
+        with conn.cursor() as cur:
+            cur.execute(sql, [user_id, keep])
+            return [bytes(row[0]) for row in cur.fetchall()]
+    ids = list(
+        Session.objects.using(alias).filter(user_id=user_id)
+        .order_by("-created_at", "-id").values_list("id", flat=True)[keep:]
+    )
+    if ids:
+        Session.objects.using(alias).filter(id__in=ids).delete()
+    return ids
 
 
 def create_session(user: User, request_meta: Optional[dict] = None, ttl_min: int = SESSION_TTL_MIN) -> Session:
     sid = secrets.token_hex(32)
+    digest = session_digest(sid)
     now = timezone.now()
     expire_at = now + timedelta(minutes=int(ttl_min))
     ua = None
@@ -110,15 +223,26 @@ def create_session(user: User, request_meta: Optional[dict] = None, ttl_min: int
             ip = xf.split(",")[0].strip()
         else:
             ip = request_meta.get("REMOTE_ADDR")
-    session = Session.objects.create(id=sid, user=user, created_at=now, expire_at=expire_at, user_agent=ua or "", ip=ip)
+    evicted: List[bytes] = []
+    with transaction.atomic(using=router.db_for_write(Session)):
+        session = Session.objects.create(
+            id=digest, user=user, created_at=now, expire_at=expire_at, last_seen_at=now, user_agent=ua or "", ip=ip,
+        )
+        if SESSION_MAX_PER_USER > 0:
+            evicted = _evict_excess_sessions(user.id, SESSION_MAX_PER_USER)
+    session.token = sid
+    if evicted:
+        session_activity.forget(evicted)
+    mark_written(f"session:{digest.hex()}", *(f"session:{d.hex()}" for d in evicted))
     return session
 
 
 def set_session_cookie(response: HttpResponse, session: Session) -> None:
     expires = session.expire_at
+    # token — исходное значение cookie, выставляется create_session / get_session
     response.set_cookie(
         key=SESSION_COOKIE_NAME,
-        value=session.id,
+        value=session.token,
         expires=expires,
         httponly=SESSION_COOKIE_HTTPONLY,
         secure=SESSION_COOKIE_SECURE,
@@ -127,28 +251,54 @@ def set_session_cookie(response: HttpResponse, session: Session) -> None:
 
 
 def revoke_session(session_id: str) -> None:
-    Session.objects.filter(id=session_id).delete()
+    digest = session_digest(session_id)
+    Session.objects.filter(id=digest).delete()
+    session_activity.forget([digest])
+    mark_written(f"session:{digest.hex()}")
+
+
+def _fetch_session(digest: bytes) -> Optional[Session]:
+    return hot_queries.session_with_user(digest)
 
 
 def get_session(session_id: str) -> Optional[Session]:
-    return Session.objects.filter(id=session_id, expire_at__gt=timezone.now()).select_related("user").first()
+    digest = session_digest(session_id)
+    with pinned(f"session:{digest.hex()}"):
+        sess = _fetch_session(digest)
+    # пользователя могли только что деактивировать: реплика может ещё отдавать его сессии
+    if sess is not None and sess._state.db != DEFAULT_DB_ALIAS and is_pinned(f"user:{sess.user_id}"):
+        with primary():
+            sess = _fetch_session(digest)
+    if sess is not None:
+        sess.token = session_id
+    return sess
 
 
 def get_user_from_jwt(token: str) -> Optional[User]:
+    return authenticate_jwt(token)[0]
+
+
+def authenticate_jwt(token: str) -> Tuple[Optional[User], Optional[Dict[str, Any]]]:
+    """(пользователь, payload) по access-токену; подпись и отзыв проверяются один раз."""
     try:
         payload = parse_jwt(token)
     except AuthError:
-        return None
+        return None, None
     if payload.get("typ") != "access":
-        return None
+        return None, None
     sub = payload.get("sub")
     if not sub:
-        return None
-    return User.objects.filter(pk=sub, is_active=True).first()
+        return None, None
+    with pinned(f"user:{sub}"):
+        user = hot_queries.active_user(sub)
+    return (user, payload) if user else (None, None)
 
 
 def get_user_from_session(session_id: str) -> Optional[User]:
-    sess = get_session(session_id)
+    return session_user(get_session(session_id))
+
+
+def session_user(sess: Optional[Session]) -> Optional[User]:
     if not sess:
         return None
     user = sess.user
@@ -0,0 +1,121 @@
+# core/db_router.py
+"""
+Реплики (REPLICA_DATABASES) обслуживают только именованные запросы горячего пути auth/RBAC
+(core.hot_queries), и только внутри pinned(ключи). Все остальные чтения ORM — get_object()
+перед save(), проверки уникальности, логин сразу после регистрации, pre_save-сигналы, тела
+ответов с ETag — роутер отправляет в default, как и запись.
+
+Read-your-writes: после записи (create_session, revoke_jwt, revoke_session, правки правил/ролей)
+вызывается mark_written(ключи) — ключи живут в общем кеше (core.shared_cache)
+REPLICA_STICKY_SECONDS, и пока они есть, pinned(...) по ним читает из primary в любом
+воркере, поэтому отозванный токен не примет и лагающая реплика. С репликами кеш обязан
+быть общим для процессов (не LocMemCache). Остаток запроса после записи (внутри
+ReplicaPinMiddleware) тоже читает из primary.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from core import shared_cache
+from core.shared_cache import cache
+
+REPLICA_DATABASES = list(getattr(settings, "REPLICA_DATABASES", []))
+REPLICA_STICKY_SECONDS = int(getattr(settings, "REPLICA_STICKY_SECONDS", 10))
+
+if REPLICA_DATABASES and not shared_cache.is_shared():
+    raise ImproperlyConfigured(
+        "REPLICA_DATABASES requires a cache shared by all workers "
+        f"(CACHES[{shared_cache.SHARED_CACHE_ALIAS!r}] is process-local)"
+    )
+
+_force_primary: ContextVar[bool] = ContextVar("force_primary", default=False)
+# реплика разрешена: внутри pinned(...) без недавней записи по его ключам
+_replica_allowed: ContextVar[bool] = ContextVar("replica_allowed", default=False)
+# состояние текущего запроса (ставит ReplicaPinMiddleware); вне запроса — None
+_request_state: ContextVar[Optional[dict]] = ContextVar("replica_request_state", default=None)
+_PIN_PREFIX = "rwpin:"
+
+
+def _primary_forced() -> bool:
+    if _force_primary.get():
+        return True
+    state = _request_state.get()
+    return state is not None and state["wrote"]
+
+
+def mark_written(*keys: str) -> None:
+    # флаг живёт до конца запроса; в командах и потоках вне запроса действуют только пины
+    state = _request_state.get()
+    if state is not None:
+        state["wrote"] = True
+    if REPLICA_DATABASES and keys:
+        cache.set_many({f"{_PIN_PREFIX}{k}": 1 for k in keys}, timeout=REPLICA_STICKY_SECONDS)
+
+
+def is_pinned(*keys: str) -> bool:
+    if not REPLICA_DATABASES or _primary_forced():
+        return True
+    return bool(cache.get_many([f"{_PIN_PREFIX}{k}" for k in keys]))
+
+
+@contextmanager
+def pinned(*keys: str):
+    """Разрешает read_alias() реплику, если ни по одному из ключей недавно не было записи."""
+    token = _replica_allowed.set(not is_pinned(*keys))
+    try:
+        yield
+    finally:
+        _replica_allowed.reset(token)
+
+
+@contextmanager
+def primary():
+    token = _force_primary.set(True)
+    try:
+        yield
+    finally:
+        _force_primary.reset(token)
+
+
+def read_alias() -> str:
+    """База для запроса горячего пути: реплика только внутри pinned(...), иначе default."""
+    if not REPLICA_DATABASES or not _replica_allowed.get() or _primary_forced():
+        return DEFAULT_DB_ALIAS
+    if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+        return DEFAULT_DB_ALIAS
+    return random.choice(REPLICA_DATABASES)
+
+
+class ReplicaPinMiddleware:
+    """Заводит состояние "запрос уже писал" на время одного запроса."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _request_state.set({"wrote": False})
+        try:
+            return self.get_response(request)
+        finally:
+            _request_state.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        # на реплику — только явно, через .using(read_alias())
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # реплики — копии default
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,189 @@
+# core/hot_queries.py
+"""
+Фиксированный набор запросов горячего пути auth/RBAC на server-side prepared statements.
+
+На PostgreSQL каждый запрос один раз на соединение готовится через PREPARE и дальше
+выполняется как EXECUTE: парсинг и планирование не повторяются на каждом запросе.
+Работает с psycopg2 и psycopg 3 одинаково. Имеет смысл только на постоянных соединениях
+(CONN_MAX_AGE != 0); за pgbouncer в transaction-режиме выключается PREPARED_STATEMENTS=False.
+На остальных бэкендах — те же запросы через ORM.
+
+Это единственные чтения, которые могут уйти на реплику: база выбирается через
+core.db_router.read_alias(), т. е. реплика — только внутри pinned(...), иначе primary.
+"""
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import uuid
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from core.db_router import read_alias
+from core.models import RevokedToken, Session
+from rbac.models import RULE_FLAGS, EffectivePermission, PermissionRule, Resource, Role, UserRole
+from users.models import User
+
+PREPARED_STATEMENTS = bool(getattr(settings, "PREPARED_STATEMENTS", True))
+
+
+def _q(name: str) -> str:
+    # флаги правил называются create/update/delete: идентификаторы всегда в кавычках
+    return f'"{name}"'
+
+
+def _columns(model, alias: str) -> str:
+    return ", ".join(f"{alias}.{_q(f.column)}" for f in model._meta.concrete_fields)
+
+
+def _t(model) -> str:
+    return _q(model._meta.db_table)
+
+
+@lru_cache(maxsize=None)
+def _statements() -> Dict[str, str]:
+    # имя -> SQL с $n; типы параметров PostgreSQL выводит из сравниваемых колонок
+    return {
+        "hq_session_user": (
+            f"SELECT {_columns(Session, 's')}, {_columns(User, 'u')} FROM {_t(Session)} s "
+            f"JOIN {_t(User)} u ON u.id = s.user_id WHERE s.id = $1 AND s.expire_at > $2"
+        ),
+        "hq_jti_revoked": f"SELECT 1 FROM {_t(RevokedToken)} WHERE jti = $1 LIMIT 1",
+        "hq_active_user": f"SELECT {_columns(User, 'u')} FROM {_t(User)} u WHERE u.id = $1 AND u.is_active",
+        "hq_resource_id": f"SELECT id FROM {_t(Resource)} WHERE code = $1",
+        "hq_role_ids": f"SELECT role_id FROM {_t(UserRole)} WHERE user_id = $1",
+        "hq_rule_flags": (
+            f"SELECT {', '.join(map(_q, RULE_FLAGS))} FROM {_t(PermissionRule)} WHERE role_id = ANY($1) AND resource_id = $2"
+        ),
+        "hq_effective_bits": f"SELECT bits FROM {_t(EffectivePermission)} WHERE user_id = $1 AND resource_id = $2",
+        "hq_has_role": (
+            f"SELECT 1 FROM {_t(UserRole)} ur JOIN {_t(Role)} r ON r.id = ur.role_id "
+            f"WHERE ur.user_id = $1 AND UPPER(r.name) = UPPER($2) LIMIT 1"
+        ),
+    }
+
+
+def enabled(alias: str) -> bool:
+    conn = connections[alias]
+    return PREPARED_STATEMENTS and conn.vendor == "postgresql" and conn.settings_dict.get("CONN_MAX_AGE") != 0
+
+
+def _prepared_names(conn) -> set:
+    conn.ensure_connection()
+    prepared = conn.__dict__.get("_hot_prepared")
+    # после переподключения подготовленные запросы старого соединения недоступны
+    if prepared is None or prepared[0] is not conn.connection:
+        prepared = conn._hot_prepared = (conn.connection, set())
+    return prepared[1]
+
+
+def _prepare(conn, cur, name: str) -> None:
+    names = _prepared_names(conn)
+    if name not in names:
+        # PREPARE не транзакционный: переживает откат текущей транзакции
+        cur.execute(f"PREPARE {name} AS {_statements()[name]}")
+        names.add(name)
+
+
+def prepare_all(alias: str) -> None:
+    """Готовит весь набор заранее (например, перед замером числа запросов)."""
+    if not enabled(alias):
+        return
+    conn = connections[alias]
+    with conn.cursor() as cur:
+        for name in _statements():
+            _prepare(conn, cur, name)
+
+
+def execute(alias: str, name: str, params: Sequence) -> List[tuple]:
+    """EXECUTE заранее подготовленного запроса; PREPARE — при первом вызове на соединении."""
+    conn = connections[alias]
+    with conn.cursor() as cur:
+        _prepare(conn, cur, name)
+        cur.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", list(params))
+        return cur.fetchall()
+
+
+def _from_row(model, alias: str, values: Sequence):
+    conn = connections[alias]
+    fields = model._meta.concrete_fields
+    values = [
+        f.from_db_value(v, None, conn) if hasattr(f, "from_db_value") and v is not None else v
+        for f, v in zip(fields, values)
+    ]
+    return model.from_db(alias, [f.attname for f in fields], values)
+
+
+def session_with_user(digest: bytes) -> Optional[Session]:
+    alias = read_alias()
+    now = timezone.now()
+    if not enabled(alias):
+        return Session.objects.using(alias).filter(id=digest, expire_at__gt=now).select_related("user").first()
+    rows = execute(alias, "hq_session_user", [digest, now])
+    if not rows:
+        return None
+    n = len(Session._meta.concrete_fields)
+    session = _from_row(Session, alias, rows[0][:n])
+    session.user = _from_row(User, alias, rows[0][n:])
+    return session
+
+
+def jti_revoked(jti: uuid.UUID) -> bool:
+    alias = read_alias()
+    if not enabled(alias):
+        return RevokedToken.objects.using(alias).filter(jti=jti).exists()
+    return bool(execute(alias, "hq_jti_revoked", [jti]))
+
+
+def active_user(pk) -> Optional[User]:
+    alias = read_alias()
+    if not enabled(alias):
+        return User.objects.using(alias).filter(pk=pk, is_active=True).first()
+    try:
+        pk = int(pk)
+    except (TypeError, ValueError):
+        return None
+    rows = execute(alias, "hq_active_user", [pk])
+    return _from_row(User, alias, rows[0]) if rows else None
+
+
+def resource_id(code: str) -> Optional[int]:
+    alias = read_alias()
+    if not enabled(alias):
+        return Resource.objects.using(alias).filter(code=code).values_list("id", flat=True).first()
+    rows = execute(alias, "hq_resource_id", [code])
+    return rows[0][0] if rows else None
+
+
+def role_ids(user_id: int) -> Tuple[int, ...]:
+    alias = read_alias()
+    if not enabled(alias):
+        return tuple(UserRole.objects.using(alias).filter(user_id=user_id).values_list("role_id", flat=True).order_by())
+    return tuple(row[0] for row in execute(alias, "hq_role_ids", [user_id]))
+
+
+def rule_flags(role_ids: Iterable[int], resource_id: int) -> List[tuple]:
+    """Строки флагов RULE_FLAGS по каждой роли из role_ids для ресурса."""
+    alias = read_alias()
+    role_ids = list(role_ids)
+    if not enabled(alias):
+        qs = PermissionRule.objects.using(alias).filter(role_id__in=role_ids, resource_id=resource_id)
+        return list(qs.values_list(*RULE_FLAGS))
+    return execute(alias, "hq_rule_flags", [role_ids, resource_id])
+
+
+def effective_bits(user_id: int, resource_id: int) -> int:
+    alias = read_alias()
+    if not enabled(alias):
+        qs = EffectivePermission.objects.using(alias).filter(user_id=user_id, resource_id=resource_id)
+        bits = list(qs.values_list("bits", flat=True)[:1])
+        return bits[0] if bits else 0
+    rows = execute(alias, "hq_effective_bits", [user_id, resource_id])
+    return rows[0][0] if rows else 0
+
+
+def has_role(user_id: int, role_name: str) -> bool:
+    alias = read_alias()
+    if not enabled(alias):
+        return UserRole.objects.using(alias).filter(user_id=user_id, role__name__iexact=role_name).exists()
+    return bool(execute(alias, "hq_has_role", [user_id, role_name]))
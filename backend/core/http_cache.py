@@ -0,0 +1,191 @@
+# core/http_cache.py
+"""
+Условные GET (ETag / If-None-Match) для read-эндпоинтов.
+
+ETag = HMAC(путь + query + формат ответа + scope вызывающего + версии данных).
+Версия данных — счётчик на модель в общем кеше (core.shared_cache), увеличивается по
+post_save/post_delete (после коммита транзакции) для моделей, подписанных через track()
+в AppConfig.ready. Если кеш локален для процесса (LocMemCache), запись в одном воркере
+не меняет ETag в другом — тогда условные GET выключены, кроме ETAG_SINGLE_PROCESS=True
+(runserver, gunicorn с одним воркером).
+Scope берётся из RBAC Decision: own-scope ключуется id пользователя, any-scope — общий,
+поэтому разные области видимости никогда не делят ETag.
+"""
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Iterable, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.crypto import salted_hmac
+from django.utils.http import parse_etags, quote_etag
+
+from core import shared_cache
+from core.permissions_engine import Scope
+from core.shared_cache import cache
+
+ETAG_BODY_CACHE_SIZE = int(getattr(settings, "ETAG_BODY_CACHE_SIZE", 256))
+ETAG_SINGLE_PROCESS = bool(getattr(settings, "ETAG_SINGLE_PROCESS", False))
+_VERSION_PREFIX = "datav:"
+
+
+@lru_cache(maxsize=None)
+def enabled() -> bool:
+    return shared_cache.is_shared() or ETAG_SINGLE_PROCESS
+
+
+def _version_key(label: str) -> str:
+    return f"{_VERSION_PREFIX}{label}"
+
+
+def bump_version(label: str) -> None:
+    shared_cache.bump(_version_key(label))
+
+
+def data_versions(labels: Iterable[str]) -> Tuple[str, ...]:
+    labels = sorted(set(labels))
+    keys = [_version_key(l) for l in labels]
+    found = cache.get_many(keys)
+    out = []
+    for key in keys:
+        ver = found.get(key)
+        if ver is None:
+            ver = time.time_ns() // 1000
+            if not cache.add(key, ver, timeout=None):
+                ver = cache.get(key, ver)
+        out.append(f"{key}={ver}")
+    return tuple(out)
+
+
+def invalidate(model, using: Optional[str] = None) -> None:
+    """Для записей в обход сигналов (bulk_create, update())."""
+    label = model._meta.label_lower
+    transaction.on_commit(lambda: bump_version(label), using=using)
+
+
+def _bump_on_change(sender, **kwargs):
+    invalidate(sender, kwargs.get("using"))
+
+
+def track(*models) -> None:
+    """Подписывает модели на инвалидацию ETag; вызывается из AppConfig.ready."""
+    for model in models:
+        uid = model._meta.label_lower
+        post_save.connect(_bump_on_change, sender=model, dispatch_uid=f"http_cache.save.{uid}")
+        post_delete.connect(_bump_on_change, sender=model, dispatch_uid=f"http_cache.delete.{uid}")
+
+
+def scope_token(user, decision) -> str:
+    if decision is None or not decision.allowed:
+        return "denied"
+    if decision.scope == Scope.OWN:
+        return f"own:{getattr(user, 'id', None)}"
+    if decision.scope == Scope.ANY:
+        return "any"
+    return "none"
+
+
+def compute_etag(request, labels: Iterable[str], scope: str) -> str:
+    renderer = getattr(request, "accepted_renderer", None)
+    parts = (
+        request.path,
+        "&".join(sorted(request.META.get("QUERY_STRING", "").split("&"))),
+        getattr(renderer, "format", ""),
+        scope,
+    ) + data_versions(labels)
+    return salted_hmac("core.http_cache", "|".join(parts)).hexdigest()[:32]
+
+
+def etag_matches(request, etag: str) -> bool:
+    header = request.META.get("HTTP_IF_NONE_MATCH")
+    if not header:
+        return False
+    # "*" не поддерживается: 304 до поиска объекта и проверки прав выдал бы его существование
+    tags = {t.removeprefix("W/") for t in parse_etags(header)}
+    return quote_etag(etag) in tags
+
+
+class _BodyCache:
+    """Ограниченный LRU отрендеренных тел по ETag (ETag уже включает версию и scope)."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[str, Tuple[bytes, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, etag: str) -> Optional[Tuple[bytes, str]]:
+        with self._lock:
+            item = self._data.get(etag)
+            if item is not None:
+                self._data.move_to_end(etag)
+            return item
+
+    def put(self, etag: str, body: bytes, content_type: str) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[etag] = (body, content_type)
+            self._data.move_to_end(etag)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+body_cache = _BodyCache(ETAG_BODY_CACHE_SIZE)
+
+
+def _finalize_headers(response, etag: str):
+    response["ETag"] = quote_etag(etag)
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ("Cookie", "Authorization"))
+    return response
+
+
+class ConditionalGetMixin:
+    """
+    Для ViewSet: отвечает 304 на list/retrieve до сериализации.
+    etag_models — модели, изменения которых меняют ответ.
+    """
+    etag_models: tuple = ()
+    etag_cache_bodies = True
+
+    def etag_scope(self, request) -> str:
+        decision = getattr(self, "rbac_decision", None)
+        if decision is not None:
+            return scope_token(request.user, decision)
+        return f"user:{getattr(request.user, 'id', None)}"
+
+    def _conditional(self, request, handler, *args, **kwargs):
+        if not enabled():
+            return handler(request, *args, **kwargs)
+        labels = [m._meta.label_lower for m in self.etag_models]
+        etag = compute_etag(request, labels, self.etag_scope(request))
+        if etag_matches(request, etag):
+            return _finalize_headers(HttpResponseNotModified(), etag)
+        if self.etag_cache_bodies:
+            cached = body_cache.get(etag)
+            if cached is not None:
+                body, content_type = cached
+                return _finalize_headers(HttpResponse(body, content_type=content_type), etag)
+        response = handler(request, *args, **kwargs)
+        if response.status_code != 200:
+            return response
+        if self.etag_cache_bodies and hasattr(response, "add_post_render_callback"):
+            response.add_post_render_callback(
+                lambda r: body_cache.put(etag, r.content, r["Content-Type"])
+            )
+        return _finalize_headers(response, etag)
+
+    def list(self, request, *args, **kwargs):
+        return self._conditional(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._conditional(request, super().retrieve, *args, **kwargs)
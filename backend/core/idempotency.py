@@ -0,0 +1,38 @@
+# core/idempotency.py
+import hashlib
+import json
+from datetime import timedelta
+from typing import Any, Optional
+
+from django.conf import settings
+from django.utils import timezone
+
+from core.models import IdempotencyKey
+
+IDEMPOTENCY_KEY_TTL_MIN = int(getattr(settings, "IDEMPOTENCY_KEY_TTL_MIN", 60 * 24))
+IDEMPOTENCY_KEY_MAX_LEN = 64
+
+
+def request_hash(data: Any) -> str:
+    raw = json.dumps(data, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def lookup(user, key: str) -> Optional[IdempotencyKey]:
+    return IdempotencyKey.objects.filter(user=user, key=key, expire_at__gt=timezone.now()).first()
+
+
+def store(user, key: str, req_hash: str, status_code: int, response: Any,
+          ttl_min: int = IDEMPOTENCY_KEY_TTL_MIN) -> IdempotencyKey:
+    """Вызывать внутри той же транзакции, что и сама запись: дубликат ключа откатит обе."""
+    now = timezone.now()
+    IdempotencyKey.objects.filter(user=user, key=key, expire_at__lte=now).delete()
+    return IdempotencyKey.objects.create(
+        user=user, key=key, request_hash=req_hash, status_code=status_code,
+        response=response, created_at=now, expire_at=now + timedelta(minutes=int(ttl_min)),
+    )
+
+
+def purge_expired() -> int:
+    deleted, _ = IdempotencyKey.objects.filter(expire_at__lte=timezone.now()).delete()
+    return deleted
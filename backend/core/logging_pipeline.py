@@ -0,0 +1,183 @@
+# core/logging_pipeline.py
+"""
+Неблокирующее логирование: на потоке запроса — только put_nowait в ограниченную очередь,
+форматирование в JSON и запись в файл/консоль — в потоке QueueListener.
+"""
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+_request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+REQUEST_ID_HEADER = "HTTP_X_REQUEST_ID"
+REQUEST_ID_MAX_LEN = 64
+
+
+def get_request_id() -> Optional[str]:
+    return _request_id.get()
+
+
+class RequestIdMiddleware:
+    """Берёт X-Request-ID клиента (или генерирует) и кладёт его в контекст логов и в ответ."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        rid = request.META.get(REQUEST_ID_HEADER, "")[:REQUEST_ID_MAX_LEN] or uuid.uuid4().hex
+        request.request_id = rid
+        token = _request_id.set(rid)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_id.reset(token)
+        response["X-Request-ID"] = rid
+        return response
+
+
+class RequestIdFilter(logging.Filter):
+    """Вешается на обработчик: request_id снимается на потоке запроса, до постановки в очередь."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "request_id"):
+            rid = _request_id.get()
+            if rid is None:
+                # django.request пишет уже после выхода из middleware, но передаёт сам request
+                rid = getattr(getattr(record, "request", None), "request_id", None)
+            record.request_id = rid
+        return True
+
+
+class LevelSamplingFilter(logging.Filter):
+    """Пропускает долю записей по уровню, например {"DEBUG": 0.01, "INFO": 0.1}; WARNING+ — всегда."""
+
+    def __init__(self, rates: Optional[Dict[str, float]] = None, name: str = ""):
+        super().__init__(name)
+        self.rates = {logging.getLevelName(k) if isinstance(k, str) else k: float(v) for k, v in (rates or {}).items()}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = self.rates.get(record.levelno)
+        if rate is None or record.levelno >= logging.WARNING:
+            return True
+        return rate >= 1.0 or random.random() < rate
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+            "thread": record.threadName,
+        }
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data["exc"] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class BoundedQueueHandler(QueueHandler):
+    """QueueHandler с ограниченной очередью: при переполнении запись отбрасывается и считается."""
+
+    def __init__(self, q: queue.Queue):
+        super().__init__(q)
+        self.dropped = 0
+        self._drop_lock = threading.Lock()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # msg % args — на потоке запроса, как в QueueHandler: аргументы могут измениться после
+        # возврата, а __str__ модели может пойти в БД. В listener остаётся только JSON.
+        # Трейсбек рендерим сразу по той же причине.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._drop_lock:
+                self.dropped += 1
+
+
+_pipelines = []
+
+
+class _Pipeline:
+    def __init__(self, handler: BoundedQueueHandler, targets):
+        self.handler = handler
+        self.targets = targets
+        self.listener: Optional[QueueListener] = None
+
+    def start(self) -> None:
+        self.listener = QueueListener(self.handler.queue, *self.targets, respect_handler_level=True)
+        self.listener.start()
+
+    def stop(self) -> None:
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
+    def restart_after_fork(self) -> None:
+        # поток listener не переживает fork: в дочернем процессе — новая очередь и новый поток
+        self.listener = None
+        self.handler.queue = queue.Queue(self.handler.queue.maxsize)
+        self.handler.dropped = 0
+        self.start()
+
+
+def build_queue_handler(filename=None, console: bool = True, maxsize: int = 10000) -> BoundedQueueHandler:
+    """Фабрика для LOGGING["handlers"][...]["()"]; сама поднимает listener с целевыми обработчиками."""
+    formatter = JsonFormatter()
+    targets = []
+    if console:
+        targets.append(logging.StreamHandler(sys.stderr))
+    if filename:
+        targets.append(logging.FileHandler(filename, encoding="utf-8"))
+    for t in targets:
+        t.setFormatter(formatter)
+    handler = BoundedQueueHandler(queue.Queue(int(maxsize)))
+    pipeline = _Pipeline(handler, targets)
+    pipeline.start()
+    _pipelines.append(pipeline)
+    return handler
+
+
+def stats() -> Dict[str, int]:
+    return {
+        "queued": sum(p.handler.queue.qsize() for p in _pipelines),
+        "dropped": sum(p.handler.dropped for p in _pipelines),
+    }
+
+
+def _stop_all() -> None:
+    for p in _pipelines:
+        p.stop()
+
+
+def _restart_all_after_fork() -> None:
+    for p in _pipelines:
+        p.restart_after_fork()
+
+
+atexit.register(_stop_all)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_all_after_fork)
@@ -0,0 +1,65 @@
+import hashlib
+import random
+import statistics
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+# (таблица, DDL, выражение ключа от i, python-ключ от i)
+LAYOUTS = (
+    ("bench_session_hex", "id varchar(64) PRIMARY KEY",
+     "encode(sha256(convert_to(i::text, 'UTF8')), 'hex')",
+     lambda i: hashlib.sha256(str(i).encode()).hexdigest()),
+    ("bench_session_bin", "id bytea PRIMARY KEY",
+     "sha256(convert_to(i::text, 'UTF8'))",
+     lambda i: hashlib.sha256(str(i).encode()).digest()),
+    ("bench_jti_char", "id varchar(36) UNIQUE",
+     "md5(i::text)::uuid::text",
+     lambda i: str(uuid.UUID(hashlib.md5(str(i).encode()).hexdigest()))),
+    ("bench_jti_uuid", "id uuid UNIQUE",
+     "md5(i::text)::uuid",
+     lambda i: uuid.UUID(hashlib.md5(str(i).encode()).hexdigest())),
+)
+
+
+class Command(BaseCommand):
+    help = "Сравнивает размер индекса и латентность поиска: hex/char-ключи против bytea/uuid (только PostgreSQL)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=2_000_000)
+        parser.add_argument("--lookups", type=int, default=20_000)
+
+    def handle(self, *args, **opts):
+        if connection.vendor != "postgresql":
+            raise CommandError("PostgreSQL only")
+        rows, lookups = opts["rows"], opts["lookups"]
+        self.stdout.write(f"{'table':<20} {'index MB':>9} {'p50 us':>8} {'p99 us':>8} {'mean us':>8}")
+        with connection.cursor() as cur:
+            for table, ddl, expr, py_key in LAYOUTS:
+                # временные таблицы: исчезают вместе с соединением
+                cur.execute(f"DROP TABLE IF EXISTS {table}")
+                cur.execute(f"CREATE TEMP TABLE {table} ({ddl})")
+                cur.execute(f"INSERT INTO {table} SELECT {expr} FROM generate_series(1, %s) AS i", [rows])
+                cur.execute(f"ANALYZE {table}")
+                cur.execute(
+                    "SELECT sum(pg_relation_size(indexrelid)) FROM pg_index WHERE indrelid = %s::regclass", [table],
+                )
+                index_bytes = cur.fetchone()[0]
+                keys = [py_key(random.randint(1, rows)) for _ in range(lookups)]
+                sql = f"SELECT 1 FROM {table} WHERE id = %s"
+                for key in keys[:1000]:  # прогрев буферов
+                    cur.execute(sql, [key])
+                timings = []
+                for key in keys:
+                    start = time.perf_counter()
+                    cur.execute(sql, [key])
+                    cur.fetchone()
+                    timings.append((time.perf_counter() - start) * 1e6)
+                timings.sort()
+                self.stdout.write(
+                    f"{table:<20} {index_bytes / 2**20:>9.1f} {timings[len(timings) // 2]:>8.1f} "
+                    f"{timings[int(len(timings) * 0.99)]:>8.1f} {statistics.fmean(timings):>8.1f}"
+                )
+                cur.execute(f"DROP TABLE {table}")
@@ -0,0 +1,52 @@
+import importlib
+import time
+
+from django.core.handlers.base import BaseHandler
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+from django.urls import path
+
+
+def _view(request):
+    return HttpResponse(b"ok")
+
+
+# отдельный URLconf: замеряется цепочка middleware, а не view
+urlpatterns = [path("bench/", _view)]
+
+
+class Command(BaseCommand):
+    help = "Микробенчмарк накладных расходов middleware на запрос: API-профиль против полного стека Django"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=20_000)
+
+    def handle(self, *args, **opts):
+        full = importlib.import_module("config.settings_full")
+        api = importlib.import_module("config.settings")
+        profiles = (("none", []), ("api", api.MIDDLEWARE), ("full", full.MIDDLEWARE))
+        n = opts["requests"]
+        results = {name: self._run(middleware, n) for name, middleware in profiles}
+        base = results["none"]
+        for name, _ in profiles:
+            us = results[name]
+            self.stdout.write(f"{name:<5} {us:8.1f} us/request  (+{us - base:.1f} us middleware)")
+
+    def _run(self, middleware, n):
+        with override_settings(MIDDLEWARE=middleware):
+            handler = BaseHandler()
+            handler.load_middleware()
+        factory = RequestFactory()
+
+        def one():
+            request = factory.get("/bench/", HTTP_HOST="localhost")
+            request.urlconf = __name__
+            handler.get_response(request)
+
+        for _ in range(min(n, 1000)):
+            one()
+        start = time.perf_counter()
+        for _ in range(n):
+            one()
+        return (time.perf_counter() - start) / n * 1e6
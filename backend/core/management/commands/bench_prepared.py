@@ -0,0 +1,106 @@
+import json
+import re
+import statistics
+import time
+import uuid
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.utils import timezone
+
+from core import hot_queries
+from core.auth import session_digest
+from core.models import RevokedToken, Session
+from rbac.models import EffectivePermission, PermissionRule, Resource, Role, UserRole
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = "Сравнивает обычные запросы auth/RBAC с PREPARE/EXECUTE из core.hot_queries (только PostgreSQL)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=5000)
+
+    def handle(self, *args, **opts):
+        conn = connections[DEFAULT_DB_ALIAS]
+        if conn.vendor != "postgresql":
+            raise CommandError("PostgreSQL only")
+        # данные для запросов создаются и откатываются; PREPARE переживает откат
+        with transaction.atomic():
+            params = self._seed()
+            rows = [self._measure(conn, name, params[name], opts["iterations"]) for name in hot_queries._statements()]
+            transaction.set_rollback(True)
+
+        self.stdout.write(
+            f"{'statement':<20} {'plain us':>9} {'prep us':>9} {'saved us':>9} {'plan ms':>8} {'plan ms prep':>12}"
+        )
+        for name, plain, prepared, plan, plan_prepared in rows:
+            self.stdout.write(
+                f"{name:<20} {plain:>9.1f} {prepared:>9.1f} {plain - prepared:>9.1f} {plan:>8.3f} {plan_prepared:>12.3f}"
+            )
+        saved = {name: plain - prepared for name, plain, prepared, *_ in rows}
+        # запросы, которые делает один запрос API без прогретых кешей
+        paths = {
+            "cookie session": ["hq_session_user"],
+            "bearer jwt": ["hq_jti_revoked", "hq_active_user"],
+            "rbac cold miss": ["hq_resource_id", "hq_effective_bits"],
+            "admin check": ["hq_has_role"],
+        }
+        for label, names in paths.items():
+            self.stdout.write(f"saved per request, {label}: {sum(saved[n] for n in names):.1f} us")
+
+    def _seed(self):
+        now = timezone.now()
+        user = User.objects.create(first_name="bench", email=f"bench-{uuid.uuid4()}@example.invalid", password_hash="-")
+        role = Role.objects.create(name=f"bench-{uuid.uuid4().hex[:8]}")
+        resource = Resource.objects.create(code=f"bench-{uuid.uuid4().hex[:8]}")
+        PermissionRule.objects.create(role=role, resource=resource, read=True)
+        UserRole.objects.create(user=user, role=role)
+        EffectivePermission.objects.update_or_create(user=user, resource=resource, defaults={"bits": 1})
+        digest = session_digest(uuid.uuid4().hex)
+        Session.objects.create(id=digest, user=user, expire_at=now + timedelta(days=1))
+        jti = uuid.uuid4()
+        RevokedToken.objects.create(jti=jti, exp=now + timedelta(days=1))
+        return {
+            "hq_session_user": [digest, now],
+            "hq_jti_revoked": [jti],
+            "hq_active_user": [user.id],
+            "hq_resource_id": [resource.code],
+            "hq_role_ids": [user.id],
+            "hq_rule_flags": [[role.id], resource.id],
+            "hq_effective_bits": [user.id, resource.id],
+            "hq_has_role": [user.id, "admin"],
+        }
+
+    def _measure(self, conn, name, params, iterations):
+        # тот же текст, что шлёт ORM: параметры подставляются драйвером, сервер планирует каждый раз
+        plain_sql = re.sub(r"\$\d+", "%s", hot_queries._statements()[name])
+        with conn.cursor() as cur:
+            plain = self._time(lambda: (cur.execute(plain_sql, params), cur.fetchall()), iterations)
+        # первые 5 EXECUTE PostgreSQL планирует заново (custom plan), дальше — generic
+        prepared = self._time(lambda: hot_queries.execute(DEFAULT_DB_ALIAS, name, params), iterations)
+        placeholders = ", ".join(["%s"] * len(params))
+        plan = self._planning_ms(conn, plain_sql, params)
+        plan_prepared = self._planning_ms(conn, f"EXECUTE {name} ({placeholders})", params)
+        return name, plain, prepared, plan, plan_prepared
+
+    @staticmethod
+    def _time(fn, iterations):
+        for _ in range(min(200, iterations)):  # прогрев буферов и плана
+            fn()
+        timings = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            fn()
+            timings.append((time.perf_counter() - start) * 1e6)
+        return statistics.mean(timings)
+
+    @staticmethod
+    def _planning_ms(conn, sql, params):
+        with conn.cursor() as cur:
+            cur.execute(f"EXPLAIN (ANALYZE, FORMAT JSON) {sql}", params)
+            plan = cur.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return plan[0].get("Planning Time", 0.0)
@@ -0,0 +1,88 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from core import auth as core_auth
+from core import hot_queries, policy_store
+from core import permissions_engine as engine
+from core.middleware import AuthMiddleware
+from core.profiling import QueryBudgetExceeded, assert_max_queries
+from rbac.models import Resource, Role, UserRole
+from users.models import User
+
+# путь -> максимум SQL-запросов
+QUERY_BUDGETS = {
+    "auth.session": 1,
+    "auth.jwt": 2,
+    "rbac.permission.cold": 2,  # id ресурса + строка EffectivePermission
+    "rbac.permission.warm": 0,
+    "rbac.permission.preloaded": 1,  # после warm_caches: только роли пользователя
+}
+
+
+class _View:
+    rbac_resource = "orders"
+    action = "list"
+
+
+class Command(BaseCommand):
+    help = "Проверяет бюджет SQL-запросов для auth и RBACPermission (изменения откатываются)"
+
+    def handle(self, *args, **options):
+        failures = []
+        # бюджеты — для путей через БД; общий снимок политики (0 запросов) на время проверки выключен
+        store, policy_store.RBAC_POLICY_STORE = policy_store.RBAC_POLICY_STORE, ""
+        try:
+            with transaction.atomic():
+                failures = self._run()
+                transaction.set_rollback(True)
+        finally:
+            policy_store.RBAC_POLICY_STORE = store
+        if failures:
+            raise CommandError("\n\n".join(failures))
+        self.stdout.write(self.style.SUCCESS("Query budgets OK"))
+
+    def _check(self, label, fn, failures):
+        try:
+            with assert_max_queries(QUERY_BUDGETS[label], label) as ctx:
+                fn()
+        except QueryBudgetExceeded as exc:
+            failures.append(str(exc))
+            return
+        self.stdout.write(f"{label}: {len(ctx)}/{QUERY_BUDGETS[label]}")
+
+    def _run(self):
+        failures = []
+        user = User.objects.create(first_name="budget", email="query-budget@example.invalid", password_hash="-")
+        res, _ = Resource.objects.get_or_create(code=_View.rbac_resource)
+        role, _ = Role.objects.get_or_create(name="user")
+        UserRole.objects.get_or_create(user=user, role=role)
+        session = core_auth.create_session(user)
+        token = core_auth.make_jwt(user.id)
+
+        # PREPARE делается раз на соединение и в бюджет запроса не входит
+        hot_queries.prepare_all(DEFAULT_DB_ALIAS)
+        factory = RequestFactory()
+        middleware = AuthMiddleware(lambda r: HttpResponse())
+        cookie_req = factory.get("/")
+        cookie_req.COOKIES[core_auth.SESSION_COOKIE_NAME] = session.token
+        bearer_req = factory.get("/", HTTP_AUTHORIZATION=f"Bearer {token}")
+        self._check("auth.session", lambda: middleware.process_request(cookie_req), failures)
+        self._check("auth.jwt", lambda: middleware.process_request(bearer_req), failures)
+
+        engine.reset_caches()
+        perm = engine.RBACPermission()
+
+        def check_permission():
+            # новый запрос на каждую проверку: решения мемоизируются на объекте запроса
+            req = factory.get("/")
+            req.user = user
+            return perm.has_permission(req, _View())
+
+        self._check("rbac.permission.cold", check_permission, failures)
+        self._check("rbac.permission.warm", check_permission, failures)
+        engine.warm_caches()
+        self._check("rbac.permission.preloaded", check_permission, failures)
+        engine.reset_caches()
+        return failures
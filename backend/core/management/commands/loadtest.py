@@ -0,0 +1,226 @@
+import http.client
+import json
+import math
+import random
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+LOADTEST_EMAIL = "loadtest-{}@example.com"
+LOADTEST_ROLE = "loadtest"
+
+# сценарий одного "визита": (вес, метод, путь, тело)
+SCENARIO = (
+    (5, "GET", "/api/users/me/", None),
+    (4, "GET", "/api/biz/products/", None),
+    (4, "GET", "/api/biz/orders/", None),
+    (1, "POST", "/api/biz/orders/", "order"),
+)
+
+
+def _percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    k = max(0, math.ceil(p / 100.0 * len(sorted_values)) - 1)
+    return sorted_values[k]
+
+
+class _Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.errors = defaultdict(int)
+
+    def add(self, name, ms, status):
+        with self.lock:
+            self.latencies[name].append(ms)
+            self.statuses[name][str(status)] += 1
+            if status is None or status >= 400:
+                self.errors[name] += 1
+
+    def report(self, elapsed):
+        endpoints = {}
+        total = 0
+        for name in sorted(self.latencies):
+            lat = sorted(self.latencies[name])
+            total += len(lat)
+            endpoints[name] = {
+                "count": len(lat),
+                "rps": round(len(lat) / elapsed, 2),
+                "p50_ms": round(_percentile(lat, 50), 2),
+                "p95_ms": round(_percentile(lat, 95), 2),
+                "p99_ms": round(_percentile(lat, 99), 2),
+                "errors": self.errors[name],
+                "error_rate": round(self.errors[name] / len(lat), 4),
+                "statuses": dict(self.statuses[name]),
+            }
+        return {"elapsed_s": round(elapsed, 3), "requests": total, "rps": round(total / elapsed, 2), "endpoints": endpoints}
+
+
+class _Client:
+    """Один виртуальный клиент: своё keep-alive соединение, cookie-сессия или Bearer JWT."""
+
+    def __init__(self, base, email, password, use_jwt, stats, product_ids):
+        self.base = base
+        self.email = email
+        self.password = password
+        self.use_jwt = use_jwt
+        self.stats = stats
+        self.product_ids = product_ids
+        self.conn = None
+        self.cookie = None
+        self.access = None
+
+    def _connect(self):
+        cls = http.client.HTTPSConnection if self.base.scheme == "https" else http.client.HTTPConnection
+        self.conn = cls(self.base.hostname, self.base.port, timeout=30)
+
+    def request(self, name, method, path, body=None, auth=True):
+        headers = {"Content-Type": "application/json", "Accept": "application/json"}
+        if auth and self.use_jwt and self.access:
+            headers["Authorization"] = f"Bearer {self.access}"
+        if auth and not self.use_jwt and self.cookie:
+            headers["Cookie"] = self.cookie
+        payload = json.dumps(body).encode() if body is not None else None
+        start = time.perf_counter()
+        status, data, resp = None, None, None
+        try:
+            if self.conn is None:
+                self._connect()
+            self.conn.request(method, path, body=payload, headers=headers)
+            resp = self.conn.getresponse()
+            raw = resp.read()
+            status = resp.status
+            data = json.loads(raw) if raw and resp.getheader("Content-Type", "").startswith("application/json") else None
+        except (OSError, http.client.HTTPException, ValueError):
+            self.conn = None
+        self.stats.add(name, (time.perf_counter() - start) * 1000, status)
+        return status, data, resp
+
+    def login(self):
+        status, data, resp = self.request(
+            "POST login/", "POST", "/api/users/login/", {"email": self.email, "password": self.password}, auth=False,
+        )
+        if status != 200:
+            return False
+        self.access = data.get("access")
+        for header, value in resp.getheaders():
+            if header.lower() == "set-cookie" and value.startswith("sessionid="):
+                self.cookie = value.split(";", 1)[0]
+        return True
+
+    def logout(self):
+        self.request("POST logout/", "POST", "/api/users/logout/", {})
+        self.cookie = None
+        self.access = None
+
+    def visit(self):
+        weights = [w for w, *_ in SCENARIO]
+        _, method, path, body = random.choices(SCENARIO, weights=weights)[0]
+        if body == "order":
+            body = {"product": random.choice(self.product_ids), "quantity": random.randint(1, 3)}
+        self.request(f"{method} {path.replace('/api/users/', '').replace('/api/', '')}", method, path, body)
+
+
+class Command(BaseCommand):
+    help = "Нагрузочный тест login/me/logout/products/orders против запущенного сервера; отчёт — JSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+        parser.add_argument("--concurrency", type=int, default=16)
+        parser.add_argument("--duration", type=float, default=30.0, help="секунды")
+        parser.add_argument("--users", type=int, default=50)
+        parser.add_argument("--jwt-ratio", type=float, default=0.5, help="доля клиентов с Bearer JWT, остальные — cookie")
+        parser.add_argument("--relogin-every", type=int, default=50, help="logout + login каждые N запросов клиента, 0 — никогда")
+        parser.add_argument("--password", default="loadtest-password")
+        parser.add_argument("--seed", action="store_true", help="создать пользователей, роль и товары в БД этого проекта")
+        parser.add_argument("--seed-only", action="store_true", help="только наполнить БД, без нагрузки")
+        parser.add_argument("--output", default="", help="файл для JSON-отчёта (по умолчанию stdout)")
+
+    def handle(self, *args, **opts):
+        if opts["seed"] or opts["seed_only"]:
+            self._seed(opts["users"], opts["password"])
+            if opts["seed_only"]:
+                return
+        product_ids = self._product_ids()
+        if not product_ids:
+            raise CommandError("no products: run with --seed first")
+
+        base = urlsplit(opts["base_url"])
+        stats = _Stats()
+        deadline = time.monotonic() + opts["duration"]
+        counter = iter(range(10 ** 9))
+        counter_lock = threading.Lock()
+
+        def worker():
+            with counter_lock:
+                n = next(counter)
+            client = _Client(
+                base, LOADTEST_EMAIL.format(n % opts["users"]), opts["password"],
+                random.random() < opts["jwt_ratio"], stats, product_ids,
+            )
+            done = 0
+            while time.monotonic() < deadline:
+                if client.access is None and not client.login():
+                    time.sleep(0.1)
+                    continue
+                client.visit()
+                done += 1
+                if opts["relogin_every"] and done % opts["relogin_every"] == 0:
+                    client.logout()
+
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(opts["concurrency"])]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        report = stats.report(time.perf_counter() - started)
+        report["config"] = {k: opts[k] for k in ("base_url", "concurrency", "duration", "users", "jwt_ratio", "relogin_every")}
+        out = json.dumps(report, ensure_ascii=False, indent=2)
+        if opts["output"]:
+            with open(opts["output"], "w", encoding="utf-8") as fh:
+                fh.write(out)
+        else:
+            self.stdout.write(out)
+
+    def _product_ids(self):
+        from biz.models import Product
+        return list(Product.objects.filter(owner__email=LOADTEST_EMAIL.format(0)).values_list("id", flat=True))
+
+    def _seed(self, users, password):
+        from biz.models import Product
+        from core.auth import hash_password
+        from rbac import effective
+        from rbac.models import PermissionRule, Resource, Role, UserRole
+        from users.models import User
+
+        # bcrypt один раз на весь набор
+        pw_hash = hash_password(password)
+        role, _ = Role.objects.get_or_create(name=LOADTEST_ROLE, defaults={"description": "Нагрузочный тест"})
+        for code, flags in (
+            ("products", dict(read=True, read_all=True)),
+            ("orders", dict(read=True, create=True, update=True, delete=True)),
+        ):
+            res, _ = Resource.objects.get_or_create(code=code)
+            PermissionRule.objects.update_or_create(role=role, resource=res, defaults=flags)
+        emails = [LOADTEST_EMAIL.format(i) for i in range(users)]
+        existing = set(User.objects.filter(email__in=emails).values_list("email", flat=True))
+        User.objects.bulk_create([
+            User(first_name="Load", last_name=str(i), email=e, password_hash=pw_hash)
+            for i, e in enumerate(emails) if e not in existing
+        ])
+        User.objects.filter(email__in=emails).update(password_hash=pw_hash, is_active=True)
+        ids = User.objects.filter(email__in=emails).values_list("id", flat=True)
+        UserRole.objects.bulk_create([UserRole(user_id=uid, role=role) for uid in ids], ignore_conflicts=True)
+        effective.refresh(ids)  # bulk_create идёт в обход сигналов
+        owner = User.objects.get(email=emails[0])
+        if not Product.objects.filter(owner=owner).exists():
+            Product.objects.bulk_create([
+                Product(owner=owner, name=f"Load product {i}", price=10 + i) for i in range(20)
+            ])
+        self.stderr.write(f"seeded {users} users, role {LOADTEST_ROLE!r}")
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from core.idempotency import purge_expired
+
+
+class Command(BaseCommand):
+    help = "Удаляет просроченные ключи идемпотентности"
+
+    def handle(self, *args, **options):
+        deleted = purge_expired()
+        self.stdout.write(self.style.SUCCESS(f"Purged {deleted} idempotency keys"))
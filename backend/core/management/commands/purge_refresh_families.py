@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from core.auth import purge_expired_refresh_families
+
+
+class Command(BaseCommand):
+    help = "Удаляет истёкшие семейства refresh-токенов"
+
+    def handle(self, *args, **options):
+        deleted = purge_expired_refresh_families()
+        self.stdout.write(self.style.SUCCESS(f"Purged {deleted} refresh token families"))
@@ -0,0 +1,111 @@
+import random
+import statistics
+import threading
+import time
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from core.admission import (
+    ADMISSION_BREACH_SEC, ADMISSION_LATENCY_TARGET_MS, ADMISSION_LIMITS, ADMISSION_LOW_PRIORITY,
+    ADMISSION_MIN_SAMPLES, ADMISSION_QUEUE_SIZE, ADMISSION_QUEUE_TIMEOUT_MS, AdmissionController,
+    AdmissionMiddleware, ROUTE_CLASSES,
+)
+
+# класс -> (метод, путь) запроса, который его представляет
+REQUESTS = {
+    "auth": ("post", "/api/users/login/"),
+    "write": ("post", "/api/biz/orders/"),
+    "read": ("get", "/api/biz/orders/"),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Локальная симуляция перегрузки воркера: сервис с ограниченной ёмкостью и closed-loop клиенты; "
+        "сравнивает работу без admission control и с ним (БД и сеть не нужны)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clients", type=int, default=64)
+        parser.add_argument("--duration", type=float, default=5.0, help="секунд на каждый режим")
+        parser.add_argument("--capacity", type=int, default=4, help="сколько запросов сервис обрабатывает параллельно")
+        parser.add_argument("--auth-ms", type=float, default=250.0, help="время bcrypt-входа")
+        parser.add_argument("--write-ms", type=float, default=40.0)
+        parser.add_argument("--read-ms", type=float, default=15.0)
+        parser.add_argument("--auth-ratio", type=float, default=0.2)
+        parser.add_argument("--write-ratio", type=float, default=0.2)
+        parser.add_argument("--backoff-ms", type=float, default=50.0, help="пауза клиента после 503")
+        parser.add_argument("--limit-auth", type=int, default=ADMISSION_LIMITS.get("auth"))
+        parser.add_argument("--limit-write", type=int, default=ADMISSION_LIMITS.get("write"))
+        parser.add_argument("--limit-read", type=int, default=ADMISSION_LIMITS.get("read"))
+        parser.add_argument("--queue-size", type=int, default=ADMISSION_QUEUE_SIZE)
+        parser.add_argument("--queue-timeout-ms", type=float, default=ADMISSION_QUEUE_TIMEOUT_MS)
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **opts):
+        service_ms = {"auth": opts["auth_ms"], "write": opts["write_ms"], "read": opts["read_ms"]}
+        capacity = threading.BoundedSemaphore(opts["capacity"])
+
+        def service(request):
+            # очередь за ёмкостью неограниченна: так ведёт себя воркер без admission control
+            with capacity:
+                time.sleep(service_ms[request.route_class] / 1000)
+            return HttpResponse("ok")
+
+        self.stdout.write(
+            f"{'mode':<5} {'class':<6} {'ok':>6} {'shed':>6} {'queued':>7} {'p50 ms':>8} {'p99 ms':>8} {'in SLO':>7}"
+        )
+        self._run("off", service, None, opts)
+        controller = AdmissionController(
+            {"auth": opts["limit_auth"], "write": opts["limit_write"], "read": opts["limit_read"]},
+            opts["queue_size"], opts["queue_timeout_ms"], ADMISSION_LATENCY_TARGET_MS, ADMISSION_LOW_PRIORITY,
+            min_samples=ADMISSION_MIN_SAMPLES, breach_sec=ADMISSION_BREACH_SEC,
+        )
+        self._run("on", AdmissionMiddleware(service, admission=controller), controller, opts)
+
+    def _run(self, mode, handler, controller, opts):
+        factory = RequestFactory()
+        weights = [opts["auth_ratio"], opts["write_ratio"], max(0.0, 1 - opts["auth_ratio"] - opts["write_ratio"])]
+        classes = ["auth", "write", "read"]
+        results = defaultdict(list)  # класс -> [(status, ms)]
+        lock = threading.Lock()
+        deadline = time.monotonic() + opts["duration"]
+
+        def client(n):
+            rnd = random.Random(opts["seed"] * 1000 + n)
+            local = []
+            while time.monotonic() < deadline:
+                cls = rnd.choices(classes, weights)[0]
+                method, path = REQUESTS[cls]
+                request = getattr(factory, method)(path)
+                request.route_class = cls
+                start = time.perf_counter()
+                response = handler(request)
+                local.append((cls, response.status_code, (time.perf_counter() - start) * 1000))
+                if response.status_code == 503:
+                    time.sleep(opts["backoff_ms"] / 1000)
+            with lock:
+                for cls, status, ms in local:
+                    results[cls].append((status, ms))
+
+        threads = [threading.Thread(target=client, args=(n,), daemon=True) for n in range(opts["clients"])]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        stats = controller.stats() if controller else {}
+        for cls in ROUTE_CLASSES:
+            ok = sorted(ms for status, ms in results[cls] if status == 200)
+            shed = sum(1 for status, _ in results[cls] if status == 503)
+            target = ADMISSION_LATENCY_TARGET_MS.get(cls, float("inf"))
+            in_slo = sum(1 for ms in ok if ms <= target)
+            p50 = statistics.median(ok) if ok else 0.0
+            p99 = ok[min(len(ok) - 1, int(len(ok) * 0.99))] if ok else 0.0
+            queued = stats.get(cls, {}).get("queued", 0)
+            self.stdout.write(
+                f"{mode:<5} {cls:<6} {len(ok):>6} {shed:>6} {queued:>7} {p50:>8.0f} {p99:>8.0f} {in_slo:>7}"
+            )
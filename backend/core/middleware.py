@@ -6,6 +6,8 @@ from django.conf import settings
 from django.http import HttpRequest
 
 from core import auth as core_auth
+from core import session_activity
+from core.profiling import phase
 from users.models import User
 
 import logging
@@ -17,10 +19,12 @@ class AuthMiddleware(MiddlewareMixin):
         sid = request.COOKIES.get(getattr(settings, "SESSION_COOKIE_NAME", "sessionid"))
         if not sid:
             return None
-        user = core_auth.get_user_from_session(sid)
+        session = core_auth.get_session(sid)
+        user = core_auth.session_user(session)
         if user:
-            session = core_auth.get_session(sid)
             request.auth = {"type": "session", "session": session}
+            if session_activity.touch(session):
+                request._session_extended = session
         return user
 
     def _user_from_bearer(self, request: HttpRequest) -> Optional[User]:
@@ -32,16 +36,16 @@ class AuthMiddleware(MiddlewareMixin):
             return None
         token = parts[1].strip()
         
-        user = core_auth.get_user_from_jwt(token)
+        user, payload = core_auth.authenticate_jwt(token)
         if user:
-            try:
-                payload = core_auth.parse_jwt(token)
-            except core_auth.AuthError:
-                payload = None
             request.auth = {"type": "jwt", "payload": payload, "token": token}
         return user
 
     def process_request(self, request: HttpRequest):
+        with phase("auth"):
+            self._authenticate(request)
+
+    def _authenticate(self, request: HttpRequest):
         request.user = AnonymousUser()
         request.auth = None
 
@@ -52,4 +56,11 @@ class AuthMiddleware(MiddlewareMixin):
 
         if user:
             request.user = user
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("auth %s user=%s", request.auth["type"] if request.auth else "anonymous", getattr(user, "id", None))
 
+    def process_response(self, request: HttpRequest, response):
+        session = getattr(request, "_session_extended", None)
+        if session is not None and core_auth.SESSION_COOKIE_NAME not in response.cookies:
+            core_auth.set_session_cookie(response, session)
+        return response
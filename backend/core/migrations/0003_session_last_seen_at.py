@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 12:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='session',
+            name='last_seen_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
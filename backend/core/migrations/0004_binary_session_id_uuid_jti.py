@@ -0,0 +1,70 @@
+# Generated by Django 4.2.30 on 2026-10-19 12:45
+
+import hashlib
+import uuid
+
+import core.models
+from django.db import migrations, models
+
+
+def normalize_jti(apps, schema_editor):
+    # в Postgres приведение делает сам ALTER ... USING jti::uuid; без нативного uuid Django хранит hex без дефисов
+    if schema_editor.connection.features.has_native_uuid_field:
+        return
+    with schema_editor.connection.cursor() as cur:
+        cur.execute("SELECT id, jti FROM core_revokedtoken")
+        for pk, jti in cur.fetchall():
+            cur.execute("UPDATE core_revokedtoken SET jti = %s WHERE id = %s", [uuid.UUID(str(jti)).hex, pk])
+
+
+def denormalize_jti(apps, schema_editor):
+    if schema_editor.connection.features.has_native_uuid_field:
+        return
+    with schema_editor.connection.cursor() as cur:
+        cur.execute("SELECT id, jti FROM core_revokedtoken")
+        for pk, jti in cur.fetchall():
+            cur.execute("UPDATE core_revokedtoken SET jti = %s WHERE id = %s", [str(uuid.UUID(str(jti))), pk])
+
+
+def hash_session_ids(apps, schema_editor):
+    # Значение cookie не меняется: ключом строки становится sha256(cookie), прежние сессии остаются валидны
+    if schema_editor.connection.vendor == "postgresql":
+        # после ALTER ... USING id::bytea в id лежат ASCII-байты hex-строки
+        schema_editor.execute("UPDATE core_session SET id = sha256(id) WHERE length(id) <> 32")
+        return
+    with schema_editor.connection.cursor() as cur:
+        cur.execute("SELECT id FROM core_session")
+        for (raw,) in cur.fetchall():
+            raw_bytes = raw.encode("utf-8") if isinstance(raw, str) else bytes(raw)
+            if len(raw_bytes) == 32:
+                continue
+            cur.execute("UPDATE core_session SET id = %s WHERE id = %s", [hashlib.sha256(raw_bytes).digest(), raw])
+
+
+def drop_sessions(apps, schema_editor):
+    # исходные sessionid из хешей не восстановить: при откате все выходят из системы
+    schema_editor.execute("DELETE FROM core_session")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_session_last_seen_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='revokedtoken',
+            name='jti',
+            field=models.UUIDField(unique=True),
+        ),
+        migrations.RunPython(normalize_jti, denormalize_jti),
+        migrations.AlterField(
+            model_name='session',
+            name='id',
+            field=core.models.DigestField(max_length=32, primary_key=True, serialize=False),
+        ),
+        # при откате выполняется до обратного AlterField: bytea -> varchar идёт по пустой таблице
+        migrations.RunPython(migrations.RunPython.noop, drop_sessions),
+        migrations.RunPython(hash_session_ids, migrations.RunPython.noop),
+    ]
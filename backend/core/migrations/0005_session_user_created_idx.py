@@ -0,0 +1,24 @@
+# Generated by Django 4.2.30 on 2026-10-19 12:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+        ('core', '0004_binary_session_id_uuid_jti'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='session',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='users.user'),
+        ),
+        migrations.AddIndex(
+            model_name='session',
+            index=models.Index(fields=['user', '-created_at'], name='core_session_user_created_idx'),
+        ),
+    ]
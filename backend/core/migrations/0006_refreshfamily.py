@@ -0,0 +1,24 @@
+# Generated by Django 4.2.30 on 2026-10-19 12:54
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+        ('core', '0005_session_user_created_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RefreshFamily',
+            fields=[
+                ('id', models.UUIDField(primary_key=True, serialize=False)),
+                ('current_jti', models.UUIDField()),
+                ('expire_at', models.DateTimeField(db_index=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='users.user')),
+            ],
+        ),
+    ]
@@ -3,25 +3,37 @@ from django.db import models
 from django.utils import timezone
 
 
+class DigestField(models.BinaryField):
+    """bytea фиксированной длины; из БД всегда bytes (psycopg отдаёт memoryview)."""
+
+    def from_db_value(self, value, expression, connection):
+        return bytes(value) if value is not None else None
+
+
 class Session(models.Model):
 
-    id = models.CharField(primary_key=True, max_length=64)  # sessionid, UUID или hex
-    user = models.ForeignKey('users.User', on_delete=models.CASCADE)
+    id = DigestField(primary_key=True, max_length=32)  # sha256(sessionid из cookie); сам sessionid в БД не хранится
+    # отдельный индекс по user не нужен: его покрывает (user, -created_at)
+    user = models.ForeignKey('users.User', on_delete=models.CASCADE, db_index=False)
     created_at = models.DateTimeField(default=timezone.now)
     expire_at = models.DateTimeField(db_index=True)
+    last_seen_at = models.DateTimeField(null=True, blank=True)  # обновляется пачками, см. core.session_activity
     user_agent = models.CharField(max_length=256, blank=True)
     ip = models.GenericIPAddressField(null=True, blank=True)
 
+    class Meta:
+        indexes = [models.Index(fields=["user", "-created_at"], name="core_session_user_created_idx")]
+
     def is_expired(self) -> bool:
         return timezone.now() >= self.expire_at
 
     def __str__(self):
-        return f"Session<{self.id}> for {self.user.email}"
+        return f"Session<{self.id.hex()[:12]}> for {self.user.email}"
 
 
 class RevokedToken(models.Model):
     
-    jti = models.CharField(max_length=36, unique=True)  # JWT ID
+    jti = models.UUIDField(unique=True)  # JWT ID
     exp = models.DateTimeField()  # срок истечения токена
     revoked_at = models.DateTimeField(default=timezone.now)
 
@@ -30,3 +42,32 @@ class RevokedToken(models.Model):
 
     def __str__(self):
         return f"RevokedToken<{self.jti}>"
+
+
+class RefreshFamily(models.Model):
+    """Цепочка ротаций refresh-токена от одного входа; действителен только current_jti."""
+
+    id = models.UUIDField(primary_key=True)  # claim "fam" в refresh-токене
+    user = models.ForeignKey('users.User', on_delete=models.CASCADE)
+    current_jti = models.UUIDField()
+    expire_at = models.DateTimeField(db_index=True)  # продлевается при каждой ротации
+
+    def __str__(self):
+        return f"RefreshFamily<{self.id}> for {self.user_id}"
+
+
+class IdempotencyKey(models.Model):
+
+    user = models.ForeignKey('users.User', on_delete=models.CASCADE)
+    key = models.CharField(max_length=64)  # заголовок Idempotency-Key
+    request_hash = models.CharField(max_length=64)  # sha256 тела запроса
+    status_code = models.PositiveSmallIntegerField()
+    response = models.JSONField()
+    created_at = models.DateTimeField(default=timezone.now)
+    expire_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        unique_together = ("user", "key")
+
+    def __str__(self):
+        return f"IdempotencyKey<{self.key}> for {self.user_id}"
@@ -1,12 +1,20 @@
 from __future__ import annotations
+import threading
+import time
 from dataclasses import dataclass
 from enum import Enum
 from functools import lru_cache
-from typing import Optional, Tuple
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Set, Tuple
+from django.conf import settings
 from django.contrib.auth.models import AnonymousUser
+from django.db import transaction
 from django.utils.functional import cached_property
-from rbac.models import Role, Resource, PermissionRule, UserRole
+from rbac.models import RULE_FLAGS, EffectivePermission, Role, Resource, PermissionRule, UserRole
 from rest_framework.permissions import BasePermission
+from core import hot_queries, policy_store, shared_cache
+from core.db_router import mark_written, pinned
+from core.profiling import phase
+from users.models import User
 
 class Action(str, Enum):
     READ = "read"
@@ -32,40 +40,164 @@ def _perm_field(action: Action, scope: Scope | None) -> str:
     base = {Action.READ: "read", Action.UPDATE: "update", Action.DELETE: "delete"}[action]
     return base if scope == Scope.OWN else f"{base}_all"
 
+_RULE_FLAGS = RULE_FLAGS
+
+# Заполняются warm_caches() до приёма трафика (и до fork, если воркеры форкаются от мастера)
+_preloaded_resource_ids: Dict[str, int] = {}
+_preloaded_rules: Optional[Dict[Tuple[int, int], Tuple[bool, ...]]] = None
+
+# Изменение политики в одном воркере остальные узнают по версиям в общем кеше
+# (core.shared_cache) и сбрасывают свои кеши не позже чем через RBAC_CACHE_CHECK_SEC.
+RBAC_CACHE_CHECK_SEC = float(getattr(settings, "RBAC_CACHE_CHECK_SEC", 1.0))
+_POLICY_VERSION_KEY = "rbac:policy:version"
+_ROLES_VERSION_KEY = "rbac:roles:version"
+_versions: Dict[str, object] = {}
+_versions_lock = threading.Lock()
+_next_version_check = 0.0
+
 @lru_cache(maxsize=512)
 def _resource_id_by_code(code: str) -> Optional[int]:
-    try:
-        return Resource.objects.only("id").get(code=code).id
-    except Resource.DoesNotExist:
-        return None
+    rid = _preloaded_resource_ids.get(code)
+    if rid is not None:
+        return rid
+    with pinned("rbac:policy"):
+        return hot_queries.resource_id(code)
 
 @lru_cache(maxsize=1024)
 def _role_ids_for_user(user_id: int) -> Tuple[int, ...]:
-    ids = UserRole.objects.filter(user_id=user_id).values_list("role_id", flat=True).order_by()
-    return tuple(ids)
+    with pinned(f"rbac:user:{user_id}"):
+        return hot_queries.role_ids(user_id)
 
 @lru_cache(maxsize=4096)
 def _rules_matrix(role_ids: Tuple[int, ...], resource_id: int) -> dict:
-    flags = {
-        "read": False,
-        "read_all": False,
-        "create": False,
-        "update": False,
-        "update_all": False,
-        "delete": False,
-        "delete_all": False,
-    }
+    flags = dict.fromkeys(_RULE_FLAGS, False)
     if not role_ids:
         return flags
-    qs = PermissionRule.objects.filter(role_id__in=role_ids, resource_id=resource_id)
-    for rp in qs.only(*flags.keys()):
-        for k in flags.keys():
-            flags[k] = flags[k] or bool(getattr(rp, k))
+    if _preloaded_rules is not None:
+        return _merge_rules(_preloaded_rules, role_ids, resource_id)
+    with pinned("rbac:policy"):
+        rows = hot_queries.rule_flags(role_ids, resource_id)
+    for row in rows:
+        for k, v in zip(_RULE_FLAGS, row):
+            flags[k] = flags[k] or bool(v)
     return flags
 
+@lru_cache(maxsize=8192)
+def _effective_flags(user_id: int, resource_id: int) -> dict:
+    """Материализованная маска (rbac.effective): один lookup по уникальному (user, resource)."""
+    with pinned("rbac:policy", f"rbac:user:{user_id}"):
+        return EffectivePermission.unpack(hot_queries.effective_bits(user_id, resource_id))
+
+def _merge_rules(rows: Mapping[Tuple[int, int], Tuple[bool, ...]], role_ids: Iterable[int], resource_id: int) -> dict:
+    flags = dict.fromkeys(_RULE_FLAGS, False)
+    for role_id in role_ids:
+        row = rows.get((role_id, resource_id))
+        if row:
+            for k, v in zip(_RULE_FLAGS, row):
+                flags[k] = flags[k] or bool(v)
+    return flags
+
+def _decide(rules: dict, action: Action) -> Decision:
+    if action == Action.CREATE:
+        return Decision(bool(rules.get("create", False)), None)
+    if rules.get(_perm_field(action, Scope.ANY), False):
+        return Decision(True, Scope.ANY)
+    if rules.get(_perm_field(action, Scope.OWN), False):
+        return Decision(True, Scope.OWN)
+    return Decision(False, None)
+
+def _owner_matches(decision: Decision, user_id: int, owner_id: Optional[int]) -> Decision:
+    if decision.scope != Scope.OWN:
+        return decision
+    if owner_id is not None and int(owner_id) == int(user_id):
+        return decision
+    return Decision(False, None)
+
+def _shared_versions() -> Dict[str, object]:
+    return shared_cache.cache.get_many([_POLICY_VERSION_KEY, _ROLES_VERSION_KEY])
+
+
+def _sync_versions() -> None:
+    """Сбрасывает кеши процесса, если политику или роли изменил другой воркер."""
+    global _next_version_check
+    now = time.monotonic()
+    if now < _next_version_check or not shared_cache.is_shared():
+        return
+    with _versions_lock:
+        if now < _next_version_check:
+            return
+        _next_version_check = now + RBAC_CACHE_CHECK_SEC
+        current = _shared_versions()
+        policy_changed = current.get(_POLICY_VERSION_KEY) != _versions.get(_POLICY_VERSION_KEY)
+        roles_changed = current.get(_ROLES_VERSION_KEY) != _versions.get(_ROLES_VERSION_KEY)
+        _versions.update(current)
+    if policy_changed:
+        warm_caches() if _preloaded_rules is not None else reset_caches()
+    elif roles_changed:
+        _clear_user_caches()
+
+
+def _bump_policy_version() -> None:
+    shared_cache.bump(_POLICY_VERSION_KEY)
+
+
+def _bump_roles_version() -> None:
+    shared_cache.bump(_ROLES_VERSION_KEY)
+
+
+def warm_caches() -> None:
+    """Загружает id всех ресурсов и всю матрицу role×resource одним проходом.
+
+    Матрица держится в процессе, только если общий кеш виден всем воркерам: иначе
+    изменение правил в одном воркере не дошло бы до копий матрицы в остальных.
+    """
+    global _preloaded_rules
+    if shared_cache.is_shared():
+        # версия — до чтения: изменение во время загрузки приведёт к повторному прогреву
+        with _versions_lock:
+            _versions.update(_shared_versions())
+    resources = dict(Resource.objects.values_list("code", "id"))
+    rules = {
+        (role_id, resource_id): tuple(bool(v) for v in flags)
+        for role_id, resource_id, *flags in PermissionRule.objects.values_list("role_id", "resource_id", *_RULE_FLAGS)
+    }
+    reset_caches()
+    _preloaded_resource_ids.update(resources)
+    _preloaded_rules = rules if shared_cache.is_shared() else None
+
+def reset_caches() -> None:
+    """Сбрасывает кеши процесса; вызывается при изменении ресурсов, правил и ролей пользователей."""
+    global _preloaded_rules
+    _preloaded_resource_ids.clear()
+    _preloaded_rules = None
+    _resource_id_by_code.cache_clear()
+    _role_ids_for_user.cache_clear()
+    _rules_matrix.cache_clear()
+    _effective_flags.cache_clear()
+
+def _clear_user_caches() -> None:
+    _role_ids_for_user.cache_clear()
+    _effective_flags.cache_clear()
+
+def _on_policy_change(sender, **kwargs) -> None:
+    # ресурсы/правила меняются редко: перечитываем матрицу целиком после коммита
+    mark_written("rbac:policy")
+    preloaded = _preloaded_rules is not None
+    transaction.on_commit(_bump_policy_version, using=kwargs.get("using"))
+    transaction.on_commit(warm_caches if preloaded else reset_caches, using=kwargs.get("using"))
+    policy_store.schedule_publish(using=kwargs.get("using"))
+
+def _on_user_role_change(sender, instance=None, **kwargs) -> None:
+    if instance is not None:
+        mark_written(f"rbac:user:{instance.user_id}")
+    transaction.on_commit(_bump_roles_version, using=kwargs.get("using"))
+    transaction.on_commit(_clear_user_caches, using=kwargs.get("using"))
+    policy_store.schedule_publish(using=kwargs.get("using"))
+
 class AccessEvaluator:
     def __init__(self, user):
         self.user = user
+        self._grants: Dict[Tuple[str, Action], Decision] = {}
 
     @cached_property
     def _role_ids(self) -> Tuple[int, ...]:
@@ -73,57 +205,182 @@ class AccessEvaluator:
             return tuple()
         return _role_ids_for_user(self.user.id)
 
-    def evaluate(self, resource_code: str, action: Action, *, owner_id: Optional[int] = None) -> Decision:
+    def grant(self, resource_code: str, action: Action) -> Decision:
+        """Максимальный scope, доступный пользователю, без привязки к конкретному объекту."""
+        key = (resource_code, action)
+        decision = self._grants.get(key)
+        if decision is None:
+            decision = self._grants[key] = self._resolve(resource_code, action)
+        return decision
+
+    def _resolve(self, resource_code: str, action: Action) -> Decision:
         if not _is_authenticated_user(self.user):
             return Decision(False, None)
-        resource_id = _resource_id_by_code(resource_code)
+        _sync_versions()
+        store = policy_store.current()
+        resource_id = store.resource_id(resource_code) if store is not None else None
+        in_snapshot = resource_id is not None
+        if resource_id is None:
+            # снимка нет, или ресурс создан в обход сигналов и снимок ещё не пересобран
+            resource_id = _resource_id_by_code(resource_code)
         if resource_id is None:
             return Decision(False, None)
         if getattr(self.user, "is_superuser", False):
             scope = Scope.ANY if action != Action.CREATE else None
             return Decision(True, scope)
-        rules = _rules_matrix(self._role_ids, resource_id)
-        if action == Action.CREATE:
-            ok = rules.get("create", False)
-            return Decision(bool(ok), None)
-        any_field = _perm_field(action, Scope.ANY)
-        if rules.get(any_field, False):
-            return Decision(True, Scope.ANY)
-        own_field = _perm_field(action, Scope.OWN)
-        if rules.get(own_field, False) and owner_id is not None:
-            if int(owner_id) == int(getattr(self.user, "id")):
-                return Decision(True, Scope.OWN)
-        return Decision(False, None)
+        if in_snapshot:
+            role_ids = store.role_ids(self.user.id)
+            if role_ids:
+                # общий для воркеров снимок: роли и матрица без запросов и без копий в процессе
+                return _decide(EffectivePermission.unpack(store.bits(role_ids, resource_id)), action)
+            # пользователя нет в снимке (нет ролей или они назначены в обход сигналов): маска из БД
+        elif store is None and _preloaded_rules is not None:
+            # матрица уже в памяти: нужны только роли пользователя
+            return _decide(_rules_matrix(self._role_ids, resource_id), action)
+        return _decide(_effective_flags(self.user.id, resource_id), action)
+
+    def evaluate(self, resource_code: str, action: Action, *, owner_id: Optional[int] = None) -> Decision:
+        return _owner_matches(self.grant(resource_code, action), getattr(self.user, "id"), owner_id)
+
+    def allowed_ids(self, resource_code: str, action: Action, objs: Iterable, owner_attr: str = "owner_id") -> Set:
+        """Пакетная проверка уже загруженных объектов: одно разрешение scope на всю коллекцию."""
+        decision = self.grant(resource_code, action)
+        if not decision.allowed:
+            return set()
+        if decision.scope != Scope.OWN:
+            return {obj.pk for obj in objs}
+        uid = int(getattr(self.user, "id"))
+        return {obj.pk for obj in objs if _extract_owner_id(obj, owner_attr) == uid}
+
+def evaluator_for(request) -> AccessEvaluator:
+    """Один AccessEvaluator на запрос: решения по (resource, action) мемоизируются до конца запроса."""
+    req = getattr(request, "_request", request)
+    ev = getattr(req, "_rbac_evaluator", None)
+    if ev is None or ev.user is not request.user:
+        ev = AccessEvaluator(request.user)
+        req._rbac_evaluator = ev
+    return ev
+
+def check_batch(checks: Sequence[Tuple[int, str, Action, Optional[int]]]) -> List[Decision]:
+    """Решения для пакета (user_id, resource_code, action, owner_id) в порядке входа.
+
+    Пользователи читаются одним запросом на весь пакет; ресурсы и права — из общего снимка
+    политики, а без него (или для пар, которых в снимке нет) одним запросом каждый:
+    материализованные маски либо роли поверх предзагруженной матрицы.
+    Решения мемоизируются по (user_id, resource_code, action).
+    """
+    if not checks:
+        return []
+    _sync_versions()
+    user_ids = {c[0] for c in checks}
+    codes = {c[1] for c in checks}
+
+    superusers = dict(User.objects.filter(id__in=user_ids, is_active=True).values_list("id", "is_superuser"))
+
+    store = policy_store.current()
+    if store is not None:
+        resource_ids = {code: rid for code in codes if (rid := store.resource_id(code)) is not None}
+    else:
+        resource_ids = {code: _preloaded_resource_ids[code] for code in codes if code in _preloaded_resource_ids}
+    snapshot_codes = set(resource_ids) if store is not None else set()
+    missing = codes - resource_ids.keys()
+    if missing:
+        resource_ids.update(Resource.objects.filter(code__in=missing).values_list("code", "id"))
+
+    rows = _preloaded_rules if store is None else None
+    user_roles: Dict[int, Set[int]] = {uid: set() for uid in superusers}
+    effective: Dict[Tuple[int, int], int] = {}
+    regular = [uid for uid, su in superusers.items() if not su]
+    snapshot_roles = {uid: store.role_ids(uid) for uid in regular} if store is not None else {}
+    if store is not None:
+        # пары вне снимка (пользователь без ролей в нём, ресурс не из него) — по материализованным маскам
+        db_users = regular if codes - snapshot_codes else [uid for uid in regular if not snapshot_roles[uid]]
+    else:
+        db_users = regular
+    if db_users and resource_ids:
+        if rows is not None:
+            pairs = UserRole.objects.filter(user_id__in=db_users).values_list("user_id", "role_id").order_by()
+            for uid, role_id in pairs:
+                user_roles[uid].add(role_id)
+        else:
+            qs = EffectivePermission.objects.filter(user_id__in=db_users, resource_id__in=set(resource_ids.values()))
+            for uid, resource_id, bits in qs.values_list("user_id", "resource_id", "bits"):
+                effective[(uid, resource_id)] = bits
+
+    grants: Dict[Tuple[int, str, Action], Decision] = {}
+    out: List[Decision] = []
+    for user_id, code, action, owner_id in checks:
+        key = (user_id, code, action)
+        decision = grants.get(key)
+        if decision is None:
+            resource_id = resource_ids.get(code)
+            if user_id not in superusers or resource_id is None:
+                decision = Decision(False, None)
+            elif superusers[user_id]:
+                decision = Decision(True, Scope.ANY if action != Action.CREATE else None)
+            elif code in snapshot_codes and snapshot_roles[user_id]:
+                decision = _decide(EffectivePermission.unpack(store.bits(snapshot_roles[user_id], resource_id)), action)
+            elif rows is not None:
+                decision = _decide(_merge_rules(rows, user_roles[user_id], resource_id), action)
+            else:
+                decision = _decide(EffectivePermission.unpack(effective.get((user_id, resource_id), 0)), action)
+            grants[key] = decision
+        out.append(_owner_matches(decision, user_id, owner_id))
+    return out
 
 def evaluate_access(user, resource_code: str, action: str | Action, *, owner_id: Optional[int] = None) -> Decision:
     act = action if isinstance(action, Action) else Action(action)
     return AccessEvaluator(user).evaluate(resource_code, act, owner_id=owner_id)
 
+def evaluate_scope(user, resource_code: str, action: str | Action) -> Decision:
+    act = action if isinstance(action, Action) else Action(action)
+    return AccessEvaluator(user).grant(resource_code, act)
+
 class RBACPermission(BasePermission):
     message = "Forbidden"
 
     def has_permission(self, request, view) -> bool:
+        with phase("permissions"):
+            return self._has_permission(request, view)
+
+    def has_object_permission(self, request, view, obj) -> bool:
+        with phase("permissions"):
+            return self._has_object_permission(request, view, obj)
+
+    def _has_permission(self, request, view) -> bool:
         res = getattr(view, "rbac_resource", None)
         if not res:
             return True
-        action = _map_view_action(view, request)
+        action = map_view_action(view, request)
         if action is None:
             return True
-        decision = evaluate_access(request.user, res, action)
+        # на уровне запроса объекта ещё нет: достаточно права хотя бы на "свои",
+        # владелец проверяется в has_object_permission / фильтром queryset
+        decision = evaluator_for(request).grant(res, action)
+        view.rbac_decision = decision
         return decision.allowed
 
-    def has_object_permission(self, request, view, obj) -> bool:
+    def _has_object_permission(self, request, view, obj) -> bool:
         res = getattr(view, "rbac_resource", None)
         if not res:
             return True
-        action = _map_view_action(view, request)
+        action = map_view_action(view, request)
         if action is None:
             return True
         owner_id = _extract_owner_id(obj, getattr(view, "rbac_owner_attr", "owner_id"))
-        decision = evaluate_access(request.user, res, action, owner_id=owner_id)
+        decision = evaluator_for(request).evaluate(res, action, owner_id=owner_id)
         return decision.allowed
 
-def _map_view_action(view, request) -> Optional[Action]:
+    def allowed_object_ids(self, request, view, objs) -> Set:
+        """Для view, проверяющих N объектов: множество pk, к которым есть доступ."""
+        res = getattr(view, "rbac_resource", None)
+        action = map_view_action(view, request)
+        if not res or action is None:
+            return {obj.pk for obj in objs}
+        return evaluator_for(request).allowed_ids(res, action, objs, getattr(view, "rbac_owner_attr", "owner_id"))
+
+def map_view_action(view, request) -> Optional[Action]:
+    """RBAC-действие view: rbac_action_<action> у ViewSet, иначе по action или HTTP-методу."""
     action_name = getattr(getattr(view, "action", None), "lower", lambda: None)()
     if action_name:
         attr = f"rbac_action_{action_name}"
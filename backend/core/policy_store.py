@@ -0,0 +1,336 @@
+# core/policy_store.py
+"""
+Общий для всех воркеров снимок RBAC-политики в файле под /dev/shm.
+
+В снимке: id ресурсов, матрица role×resource (битовые маски RULE_FLAGS) и назначения
+user→roles в виде отсортированных массивов int64. Воркеры отображают файл через mmap
+и ищут по нему bisect'ом прямо в memoryview — без копирования и без своих lru-кешей.
+
+Пересборку после коммита изменения политики запрашивает schedule_publish(): запрос только
+будит фоновый поток процесса, сам коммитящий запрос снимок не строит. Поток выжидает
+RBAC_POLICY_STORE_PUBLISH_DELAY, сливает все накопившиеся запросы в одну пересборку и под
+flock пишет временный файл, атомарно подменяя его через os.replace и увеличивая версию
+в заголовке; если другой процесс уже собрал снимок после этих коммитов, сборка пропускается.
+При выходе процесса (management-команды) невыполненный запрос публикуется синхронно.
+warmup при старте вызывает publish() напрямую. Остальные замечают новый файл не позже чем через
+RBAC_POLICY_STORE_CHECK_SEC. Записи в обход сигналов (bulk_create, queryset update()/delete())
+должны заканчиваться rbac.effective.refresh() или schedule_publish(); до пересборки
+пользователи и ресурсы, которых нет в снимке, проверяются по БД.
+
+RBAC_POLICY_STORE="auto" — файл /dev/shm/rbac-policy-<uid>/<ключ>.bin, где ключ — хеш HOST,
+PORT и NAME базы default (в момент обращения: у manage.py test это тестовая база) и модуля
+настроек, так что тесты и второй деплой на том же хосте не делят снимок. Каталог снимка
+должен принадлежать текущему пользователю и не быть доступным на запись группе и остальным
+(0700): файл, подложенный другим локальным пользователем, не отображается.
+"""
+import atexit
+import hashlib
+import logging
+import mmap
+import os
+import stat
+import struct
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterable, Optional, Tuple
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+try:
+    import fcntl
+except ImportError:  # не POSIX: хранилище недоступно, работают кеши процесса
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+RBAC_POLICY_STORE = getattr(settings, "RBAC_POLICY_STORE", "") if fcntl else ""
+RBAC_POLICY_STORE_CHECK_SEC = float(getattr(settings, "RBAC_POLICY_STORE_CHECK_SEC", 1.0))
+RBAC_POLICY_STORE_PUBLISH_DELAY = float(getattr(settings, "RBAC_POLICY_STORE_PUBLISH_DELAY", 0.2))
+
+_MAGIC = b"RBP2"
+# magic, версия снимка, время сборки, ресурсов, правил, пользователей, назначений
+_HEADER = struct.Struct("<4sQdIIII")
+
+
+def _path() -> str:
+    if RBAC_POLICY_STORE != "auto":
+        return RBAC_POLICY_STORE
+    db = connections[DEFAULT_DB_ALIAS].settings_dict
+    key = "|".join([*(str(db.get(k) or "") for k in ("HOST", "PORT", "NAME")), settings.SETTINGS_MODULE])
+    return f"/dev/shm/rbac-policy-{os.geteuid()}/{hashlib.sha256(key.encode()).hexdigest()[:16]}.bin"
+
+
+def _pad8(n: int) -> int:
+    return (n + 7) & ~7
+
+
+class PolicySnapshot:
+    """Read-only представление снимка поверх mmap."""
+
+    def __init__(self, buf, stat_key: Tuple[int, int]):
+        magic, self.version, self.built_at, n_res, n_rules, n_users, n_assign = _HEADER.unpack_from(buf, 0)
+        if magic != _MAGIC:
+            raise ValueError("not a policy snapshot")
+        self.stat_key = stat_key
+        mv = memoryview(buf)
+        off = _pad8(_HEADER.size)
+
+        def take(fmt: str, count: int, size: int):
+            nonlocal off
+            view = mv[off:off + count * size].cast(fmt)
+            off = _pad8(off + count * size)
+            return view
+
+        res_ids = take("q", n_res, 8)
+        code_offsets = take("I", n_res + 1, 4)
+        codes = take("B", code_offsets[n_res], 1)
+        # ресурсов десятки: словарь code -> id строится при открытии
+        self._resources: Dict[str, int] = {
+            bytes(codes[code_offsets[i]:code_offsets[i + 1]]).decode("utf-8"): res_ids[i] for i in range(n_res)
+        }
+        # правила отсортированы по (role_id, resource_id): две параллельные колонки int64
+        # вместо ключа role_id << 32 | resource_id, который не вмещает id >= 2**31
+        self._rule_roles = take("q", n_rules, 8)
+        self._rule_resources = take("q", n_rules, 8)
+        self._rule_bits = take("B", n_rules, 1)
+        self._user_ids = take("q", n_users, 8)
+        self._user_offsets = take("I", n_users + 1, 4)
+        self._role_ids = take("q", n_assign, 8)
+
+    def resource_id(self, code: str) -> Optional[int]:
+        return self._resources.get(code)
+
+    def role_ids(self, user_id: int) -> Tuple[int, ...]:
+        i = bisect_left(self._user_ids, user_id)
+        if i == len(self._user_ids) or self._user_ids[i] != user_id:
+            return ()
+        return tuple(self._role_ids[self._user_offsets[i]:self._user_offsets[i + 1]])
+
+    def bits(self, role_ids: Iterable[int], resource_id: int) -> int:
+        mask = 0
+        roles, resources = self._rule_roles, self._rule_resources
+        for role_id in role_ids:
+            lo = bisect_left(roles, role_id)
+            hi = bisect_left(roles, role_id + 1, lo)
+            i = bisect_left(resources, resource_id, lo, hi)
+            if i < hi and resources[i] == resource_id:
+                mask |= self._rule_bits[i]
+        return mask
+
+
+_lock = threading.Lock()
+_snapshot: Optional[PolicySnapshot] = None
+_next_check = 0.0
+
+
+def _trusted(st: os.stat_result) -> bool:
+    return st.st_uid == os.geteuid() and not st.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+
+
+def _private_dir(store: str, create: bool = False) -> bool:
+    path = os.path.dirname(os.path.abspath(store))
+    if create:
+        os.makedirs(path, mode=0o700, exist_ok=True)
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return False
+    if stat.S_ISDIR(st.st_mode) and _trusted(st):
+        return True
+    logger.error("rbac policy store: %s must be a directory owned by uid %s and not writable by others", path, os.geteuid())
+    return False
+
+
+def _open(store: str) -> Optional[PolicySnapshot]:
+    if not _private_dir(store):
+        return None
+    try:
+        fd = os.open(store, os.O_RDONLY | getattr(os, "O_NOFOLLOW", 0))
+    except OSError:
+        return None
+    try:
+        st = os.fstat(fd)
+        if not stat.S_ISREG(st.st_mode) or not _trusted(st):
+            logger.error("rbac policy store: ignoring %s not owned by uid %s", store, os.geteuid())
+            return None
+        buf = mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+        return PolicySnapshot(buf, (st.st_ino, st.st_mtime_ns))
+    except (OSError, ValueError, struct.error):
+        return None
+    finally:
+        os.close(fd)
+
+
+def current() -> Optional[PolicySnapshot]:
+    """Актуальный снимок или None (хранилище выключено / ещё не опубликовано)."""
+    global _snapshot, _next_check
+    if not RBAC_POLICY_STORE:
+        return None
+    now = time.monotonic()
+    if now < _next_check:
+        return _snapshot
+    with _lock:
+        _next_check = now + RBAC_POLICY_STORE_CHECK_SEC
+        store = _path()
+        try:
+            st = os.stat(store)
+        except OSError:
+            _snapshot = None
+            return None
+        if _snapshot is None or _snapshot.stat_key != (st.st_ino, st.st_mtime_ns):
+            # старый mmap не закрываем: его memoryview может держать другой поток
+            _snapshot = _open(store)
+        return _snapshot
+
+
+@contextmanager
+def _publish_lock(store: str):
+    with open(store + ".lock", "a") as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _build(version: int) -> bytes:
+    from rbac.models import RULE_FLAGS, EffectivePermission, PermissionRule, Resource, UserRole
+
+    # время до чтения БД: снимок заведомо видит всё, что закоммичено раньше built_at
+    built_at = time.time()
+    resources = sorted(Resource.objects.values_list("code", "id"))
+    rules = sorted(
+        (role_id, resource_id, EffectivePermission.pack(flags))
+        for role_id, resource_id, *flags in PermissionRule.objects.values_list("role_id", "resource_id", *RULE_FLAGS)
+    )
+    assignments = UserRole.objects.order_by("user_id", "role_id").values_list("user_id", "role_id")
+    user_ids, user_offsets, role_ids = array("q"), array("I", [0]), array("q")
+    for user_id, role_id in assignments.iterator(chunk_size=10000):
+        if not user_ids or user_ids[-1] != user_id:
+            if user_ids:
+                user_offsets.append(len(role_ids))
+            user_ids.append(user_id)
+        role_ids.append(role_id)
+    if user_ids:
+        user_offsets.append(len(role_ids))
+
+    codes, code_offsets = bytearray(), array("I", [0])
+    for code, _ in resources:
+        codes += code.encode("utf-8")
+        code_offsets.append(len(codes))
+    sections = [
+        array("q", [rid for _, rid in resources]).tobytes(),
+        code_offsets.tobytes(),
+        bytes(codes),
+        array("q", [role_id for role_id, _, _ in rules]).tobytes(),
+        array("q", [resource_id for _, resource_id, _ in rules]).tobytes(),
+        bytes(bits for _, _, bits in rules),
+        user_ids.tobytes(),
+        user_offsets.tobytes(),
+        role_ids.tobytes(),
+    ]
+    header = _HEADER.pack(_MAGIC, version, built_at, len(resources), len(rules), len(user_ids), len(role_ids))
+    out = bytearray(header)
+    for chunk in sections:
+        out += b"\0" * (_pad8(len(out)) - len(out))
+        out += chunk
+    return bytes(out)
+
+
+def publish(max_age: Optional[float] = None, since: Optional[float] = None) -> Optional[int]:
+    """Пересобирает снимок из БД и атомарно подменяет файл; возвращает новую версию.
+
+    max_age — не пересобирать, если опубликованному снимку меньше max_age секунд
+    (старт нескольких воркеров без preload: строит первый, остальные подхватывают).
+    since — не пересобирать, если опубликованный снимок начали строить после этого момента
+    (его уже собрал другой процесс и он видит все изменения, закоммиченные до since).
+    """
+    global _snapshot, _next_check
+    if not RBAC_POLICY_STORE:
+        return None
+    store = _path()
+    if not _private_dir(store, create=True):
+        raise PermissionError(f"untrusted policy store directory for {store}")
+    with _publish_lock(store):
+        existing = _open(store)
+        if existing is not None and max_age is not None and time.time() - existing.built_at < max_age:
+            return None
+        if existing is not None and since is not None and existing.built_at > since:
+            return None
+        version = (existing.version if existing is not None else 0) + 1
+        data = _build(version)
+        tmp = f"{store}.tmp-{os.getpid()}"
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_NOFOLLOW", 0), 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, store)
+    with _lock:
+        _snapshot = _open(store)
+        _next_check = time.monotonic() + RBAC_POLICY_STORE_CHECK_SEC
+    logger.info("rbac policy store: published v%s (%d bytes)", version, len(data))
+    return version
+
+
+def _publish_after_commit(since: Optional[float] = None) -> None:
+    try:
+        publish(since=since)
+    except Exception:
+        # лучше без снимка (воркеры читают БД), чем со снимком, не знающим об изменении
+        logger.warning("rbac policy store: publish failed, removing snapshot", exc_info=True)
+        try:
+            os.unlink(_path())
+        except OSError:
+            pass
+
+
+class _Publisher:
+    """Фоновый поток пересборки: запросы, пришедшие до её начала, сливаются в одну публикацию."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        # time.time() последнего невыполненного запроса: снимок, начатый позже, покрывает все
+        self._requested_at: Optional[float] = None
+        self._pid: Optional[int] = None
+
+    def request(self) -> None:
+        with self._cond:
+            self._requested_at = time.time()
+            # после fork поток остаётся в родителе: у каждого процесса свой
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                threading.Thread(target=self._run, name="rbac-policy-publisher", daemon=True).start()
+            self._cond.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while self._requested_at is None:
+                    self._cond.wait()
+            time.sleep(RBAC_POLICY_STORE_PUBLISH_DELAY)
+            self.flush()
+
+    def flush(self) -> None:
+        """Выполняет невыполненный запрос в текущем потоке."""
+        with self._cond:
+            since, self._requested_at = self._requested_at, None
+        if since is not None:
+            try:
+                _publish_after_commit(since)
+            finally:
+                # поток публикации живёт дольше запроса: соединение не должно висеть открытым
+                connections.close_all()
+
+
+_publisher = _Publisher()
+atexit.register(_publisher.flush)
+
+
+def schedule_publish(using=None) -> None:
+    """Пересборка в фоне после коммита; изменения, накопившиеся до её начала, дают одну пересборку."""
+    if not RBAC_POLICY_STORE:
+        return
+    transaction.on_commit(_publisher.request, using=using)
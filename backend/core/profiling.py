@@ -0,0 +1,173 @@
+# core/profiling.py
+"""
+Опциональный профайлер запросов: время по фазам (auth / permissions / view / render),
+SQL с таймингами и поиск повторяющихся запросов (N+1).
+
+Включается PROFILING_ENABLED; медленные (>= PROFILING_SLOW_MS) и семплированные
+(PROFILING_SAMPLE_RATE) запросы пишутся JSON-записью в логгер "core.profiling".
+"""
+import json
+import logging
+import random
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+
+logger = logging.getLogger(__name__)
+
+PROFILING_ENABLED = bool(getattr(settings, "PROFILING_ENABLED", False))
+PROFILING_SLOW_MS = float(getattr(settings, "PROFILING_SLOW_MS", 500))
+PROFILING_SAMPLE_RATE = float(getattr(settings, "PROFILING_SAMPLE_RATE", 0.0))
+PROFILING_REPEAT_THRESHOLD = int(getattr(settings, "PROFILING_REPEAT_THRESHOLD", 3))
+PROFILING_MAX_SQL = int(getattr(settings, "PROFILING_MAX_SQL", 50))
+
+_current: ContextVar[Optional["RequestProfile"]] = ContextVar("request_profile", default=None)
+
+
+class RequestProfile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self.queries: List[dict] = []
+        self._stack: List[list] = []
+
+    def enter(self, name: str) -> None:
+        now = time.perf_counter()
+        if self._stack:
+            top = self._stack[-1]
+            self.phases[top[0]] = self.phases.get(top[0], 0.0) + now - top[1]
+        self._stack.append([name, now])
+
+    def exit(self) -> None:
+        if not self._stack:
+            return
+        now = time.perf_counter()
+        name, start = self._stack.pop()
+        self.phases[name] = self.phases.get(name, 0.0) + now - start
+        if self._stack:
+            self._stack[-1][1] = now
+
+    @property
+    def current_phase(self) -> str:
+        return self._stack[-1][0] if self._stack else "middleware"
+
+    def record_query(self, sql: str, duration: float, alias: str) -> None:
+        self.queries.append({"sql": sql, "ms": duration * 1000, "phase": self.current_phase, "db": alias})
+
+    def repeated_queries(self, threshold: int = PROFILING_REPEAT_THRESHOLD) -> List[dict]:
+        # Django передаёт SQL с плейсхолдерами, поэтому одинаковая "форма" = одинаковая строка
+        counts = Counter(q["sql"] for q in self.queries)
+        return [{"sql": sql, "count": n} for sql, n in counts.most_common() if n >= threshold]
+
+    def as_record(self, request, response) -> dict:
+        while self._stack:
+            self.exit()
+        total_ms = (time.perf_counter() - self.started) * 1000
+        return {
+            "method": request.method,
+            "path": request.path,
+            "status": getattr(response, "status_code", None),
+            "user_id": getattr(getattr(request, "user", None), "id", None),
+            "total_ms": round(total_ms, 3),
+            "phases_ms": {k: round(v * 1000, 3) for k, v in self.phases.items()},
+            "sql_count": len(self.queries),
+            "sql_ms": round(sum(q["ms"] for q in self.queries), 3),
+            "sql": [dict(q, ms=round(q["ms"], 3)) for q in self.queries[:PROFILING_MAX_SQL]],
+            "repeated": self.repeated_queries(),
+        }
+
+
+def current() -> Optional[RequestProfile]:
+    return _current.get()
+
+
+@contextmanager
+def phase(name: str):
+    """Отмечает фазу запроса; без активного профиля ничего не делает."""
+    prof = _current.get()
+    if prof is None:
+        yield
+        return
+    prof.enter(name)
+    try:
+        yield
+    finally:
+        prof.exit()
+
+
+class ProfilingMiddleware:
+    """Ставится первым в MIDDLEWARE, чтобы фаза auth попадала внутрь замера."""
+
+    def __init__(self, get_response):
+        if not PROFILING_ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        prof = RequestProfile()
+        token = _current.set(prof)
+
+        def wrapper(alias):
+            def _wrap(execute, sql, params, many, context):
+                start = time.perf_counter()
+                try:
+                    return execute(sql, params, many, context)
+                finally:
+                    prof.record_query(sql, time.perf_counter() - start, alias)
+            return _wrap
+
+        try:
+            with ExitStack() as stack:
+                for conn in connections.all():
+                    stack.enter_context(conn.execute_wrapper(wrapper(conn.alias)))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        record = prof.as_record(request, response)
+        slow = record["total_ms"] >= PROFILING_SLOW_MS
+        if slow or random.random() < PROFILING_SAMPLE_RATE:
+            record["reason"] = "slow" if slow else "sampled"
+            logger.info(json.dumps(record, ensure_ascii=False, default=str))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        prof = _current.get()
+        if prof is not None:
+            prof.enter("view")
+        return None
+
+    def process_template_response(self, request, response):
+        # DRF Response — TemplateResponse: рендер начинается сразу после этого хука
+        prof = _current.get()
+        if prof is not None and prof.current_phase == "view":
+            prof.exit()
+            prof.enter("render")
+        return response
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@contextmanager
+def assert_max_queries(budget: int, label: str = "", using: str = DEFAULT_DB_ALIAS):
+    """
+    Падает, если блок выполнил больше budget SQL-запросов:
+
+        with assert_max_queries(2, "session auth"):
+            AuthMiddleware(get_response).process_request(request)
+    """
+    from django.test.utils import CaptureQueriesContext
+
+    with CaptureQueriesContext(connections[using]) as ctx:
+        yield ctx
+    if len(ctx) > budget:
+        lines = "\n".join(f"  {i}. {q['sql']}" for i, q in enumerate(ctx.captured_queries, 1))
+        raise QueryBudgetExceeded(f"{label or 'block'}: {len(ctx)} queries, budget {budget}\n{lines}")
@@ -0,0 +1,128 @@
+# core/session_activity.py
+"""
+Скользящий срок жизни сессии без записи на каждый запрос.
+
+touch() продлевает сессию не чаще раза в SESSION_TOUCH_INTERVAL_MIN и лишь кладёт
+(id -> время) в буфер процесса; фоновый поток раз в SESSION_FLUSH_INTERVAL_SEC пишет
+весь буфер одним UPDATE ... CASE (пачками по SESSION_FLUSH_BATCH).
+"""
+import atexit
+import logging
+import os
+import threading
+from datetime import timedelta
+from typing import Dict
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Case, DateTimeField, Value, When
+from django.utils import timezone
+
+from core.models import Session
+
+logger = logging.getLogger(__name__)
+
+SESSION_TTL_MIN = int(getattr(settings, "SESSION_TTL_MIN", 60 * 24 * 30))
+SESSION_SLIDING = bool(getattr(settings, "SESSION_SLIDING", True))
+SESSION_TOUCH_INTERVAL_MIN = int(getattr(settings, "SESSION_TOUCH_INTERVAL_MIN", 5))
+SESSION_FLUSH_INTERVAL_SEC = float(getattr(settings, "SESSION_FLUSH_INTERVAL_SEC", 30))
+SESSION_FLUSH_BATCH = int(getattr(settings, "SESSION_FLUSH_BATCH", 500))
+
+_pending: Dict[str, object] = {}
+_lock = threading.Lock()
+_flusher_pid = None
+_wakeup = threading.Event()
+
+
+def touch(session: Session) -> bool:
+    """Возвращает True, если сессия продлена (значит, cookie надо выставить заново)."""
+    if not SESSION_SLIDING:
+        return False
+    now = timezone.now()
+    # строка в БД может отставать от буфера до SESSION_FLUSH_INTERVAL_SEC
+    last = max(filter(None, (session.last_seen_at, _pending.get(session.id))), default=None)
+    if last is not None and now - last < timedelta(minutes=SESSION_TOUCH_INTERVAL_MIN):
+        return False
+    _ensure_flusher()
+    session.last_seen_at = now
+    session.expire_at = now + timedelta(minutes=SESSION_TTL_MIN)
+    with _lock:
+        _pending[session.id] = now
+    return True
+
+
+def forget(session_ids) -> None:
+    """Убирает из буфера удалённые сессии (вытесненные лимитом, отозванные)."""
+    with _lock:
+        for sid in session_ids:
+            _pending.pop(sid, None)
+
+
+def flush() -> int:
+    with _lock:
+        if not _pending:
+            return 0
+        items = list(_pending.items())
+        _pending.clear()
+    now = timezone.now()
+    ttl = timedelta(minutes=SESSION_TTL_MIN)
+    updated = 0
+    for i in range(0, len(items), SESSION_FLUSH_BATCH):
+        chunk = items[i:i + SESSION_FLUSH_BATCH]
+        seen = Case(*[When(pk=sid, then=Value(ts)) for sid, ts in chunk], output_field=DateTimeField())
+        expire = Case(*[When(pk=sid, then=Value(ts + ttl)) for sid, ts in chunk], output_field=DateTimeField())
+        try:
+            # уже истёкшие (или отозванные) сессии не воскрешаем
+            updated += Session.objects.filter(pk__in=[sid for sid, _ in chunk], expire_at__gt=now).update(
+                last_seen_at=seen, expire_at=expire,
+            )
+        except Exception:
+            # cookie клиентам уже продлены: незаписанное возвращается в буфер до следующего flush
+            _requeue(items[i:])
+            raise
+    return updated
+
+
+def _requeue(items) -> None:
+    with _lock:
+        for sid, ts in items:
+            prev = _pending.get(sid)
+            if prev is None or prev < ts:
+                _pending[sid] = ts
+
+
+def _run() -> None:
+    while True:
+        _wakeup.wait(SESSION_FLUSH_INTERVAL_SEC)
+        _wakeup.clear()
+        try:
+            flush()
+        except Exception:
+            logger.warning("session activity flush failed", exc_info=True)
+        finally:
+            connections.close_all()
+
+
+def _ensure_flusher() -> None:
+    # поток создаётся лениво в каждом процессе: после fork у воркера будет свой,
+    # а унаследованный буфер родителя сбрасывается (его допишет сам родитель)
+    global _flusher_pid
+    if _flusher_pid == os.getpid():
+        return
+    with _lock:
+        if _flusher_pid == os.getpid():
+            return
+        _flusher_pid = os.getpid()
+        _pending.clear()
+    threading.Thread(target=_run, name="session-activity-flush", daemon=True).start()
+
+
+def _flush_at_exit() -> None:
+    if _flusher_pid == os.getpid():
+        try:
+            flush()
+        except Exception:
+            logger.warning("session activity flush at exit failed", exc_info=True)
+
+
+atexit.register(_flush_at_exit)
@@ -0,0 +1,34 @@
+# core/shared_cache.py
+"""
+Кеш, общий для всех воркеров: версии данных ETag (core.http_cache) и read-your-writes
+пины (core.db_router). Алиас — SHARED_CACHE_ALIAS из CACHES.
+
+LocMemCache и DummyCache живут внутри процесса: запись в одном воркере gunicorn
+другие не видят, поэтому is_shared() для них ложно.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils.connection import ConnectionProxy
+
+SHARED_CACHE_ALIAS = getattr(settings, "SHARED_CACHE_ALIAS", "default")
+
+cache = ConnectionProxy(caches, SHARED_CACHE_ALIAS)
+
+
+def is_shared() -> bool:
+    return not isinstance(caches[SHARED_CACHE_ALIAS], (LocMemCache, DummyCache))
+
+
+def bump(key: str) -> None:
+    """Увеличивает счётчик версии key (без срока жизни)."""
+    # стартовое значение от времени: если ключ вытеснен из кеша, версия не откатится к старой
+    if cache.add(key, time.time_ns() // 1000, timeout=None):
+        return
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns() // 1000, timeout=None)
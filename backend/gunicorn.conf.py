@@ -0,0 +1,39 @@
+# gunicorn.conf.py — подхватывается автоматически при запуске из backend/
+import gc
+import multiprocessing
+import os
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+
+# версии ETag в LocMemCache видны только своему процессу (config/settings.py)
+if os.getenv("ETAG_SINGLE_PROCESS", "False") == "True" and workers > 1:
+    raise RuntimeError("ETAG_SINGLE_PROCESS=True requires GUNICORN_WORKERS=1")
+
+# preload: config.wsgi (и прогрев RBAC) выполняется в мастере один раз,
+# воркеры получают прогретые структуры через copy-on-write
+preload_app = os.getenv("GUNICORN_PRELOAD", "True") == "True"
+
+
+def _warmup():
+    from rbac.registry import warmup
+    warmup()
+
+
+def when_ready(server):
+    # мастер с preload_app уже загрузил приложение; без preload Django в мастере не настроен
+    if preload_app:
+        _warmup()
+
+
+def post_worker_init(worker):
+    if not preload_app:
+        _warmup()
+
+
+def pre_fork(server, worker):
+    if preload_app:
+        from django.db import connections
+        connections.close_all()
+        # объекты, созданные до fork, не трогаются сборщиком мусора и не копируются постранично
+        gc.freeze()
@@ -0,0 +1,24 @@
+from django.apps import AppConfig
+from django.db.models.signals import pre_save, post_save, post_delete
+
+
+class RbacConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "rbac"
+
+    def ready(self):
+        from core import http_cache, permissions_engine
+        from . import effective
+        from .models import Role, Resource, PermissionRule, UserRole
+        http_cache.track(Role, Resource, PermissionRule, UserRole)
+        # сначала материализованные права (в транзакции изменения), затем сброс кешей (on_commit)
+        for model, handler in ((UserRole, effective._on_user_role_change), (PermissionRule, effective._on_rule_change)):
+            name = model.__name__
+            pre_save.connect(effective._remember_previous, sender=model, dispatch_uid=f"rbac.effective.pre.{name}")
+            post_save.connect(handler, sender=model, dispatch_uid=f"rbac.effective.save.{name}")
+            post_delete.connect(handler, sender=model, dispatch_uid=f"rbac.effective.delete.{name}")
+        for model in (Resource, PermissionRule):
+            post_save.connect(permissions_engine._on_policy_change, sender=model, dispatch_uid=f"rbac.policy.save.{model.__name__}")
+            post_delete.connect(permissions_engine._on_policy_change, sender=model, dispatch_uid=f"rbac.policy.delete.{model.__name__}")
+        post_save.connect(permissions_engine._on_user_role_change, sender=UserRole, dispatch_uid="rbac.user_role.save")
+        post_delete.connect(permissions_engine._on_user_role_change, sender=UserRole, dispatch_uid="rbac.user_role.delete")
@@ -0,0 +1,126 @@
+# rbac/effective.py
+"""
+Материализованные эффективные права: (user, resource) -> битовая маска OR правил всех ролей.
+
+Таблица EffectivePermission поддерживается сигналами UserRole/PermissionRule; записи в обход
+сигналов (bulk_create, update()) пересчитываются через refresh(). refresh() считает и пишет
+маски в одной транзакции под блокировкой строк пользователей: два параллельных изменения
+одного пользователя пересчитываются по очереди, и второй видит закоммиченное первым.
+Читается таблица при промахе кешей и общего снимка политики (core.permissions_engine).
+Полная пересборка и сверка — `python manage.py rebuild_effective_permissions`.
+"""
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db import transaction
+
+from core import policy_store
+from users.models import User
+
+from .models import RULE_FLAGS, EffectivePermission, PermissionRule, UserRole
+
+CHUNK_USERS = 1000
+
+Bits = Dict[Tuple[int, int], int]
+
+
+def compute(user_ids: Optional[Iterable[int]] = None, resource_ids: Optional[Iterable[int]] = None) -> Bits:
+    """Маски из UserRole × PermissionRule; None — по всем пользователям / ресурсам."""
+    roles = UserRole.objects.order_by()
+    if user_ids is not None:
+        roles = roles.filter(user_id__in=list(user_ids))
+    users_by_role: Dict[int, List[int]] = defaultdict(list)
+    for user_id, role_id in roles.values_list("user_id", "role_id"):
+        users_by_role[role_id].append(user_id)
+    if not users_by_role:
+        return {}
+    rules = PermissionRule.objects.filter(role_id__in=list(users_by_role)).order_by()
+    if resource_ids is not None:
+        rules = rules.filter(resource_id__in=list(resource_ids))
+    bits: Bits = defaultdict(int)
+    for role_id, resource_id, *flags in rules.values_list("role_id", "resource_id", *RULE_FLAGS):
+        mask = EffectivePermission.pack(flags)
+        if not mask:
+            continue
+        for user_id in users_by_role[role_id]:
+            bits[(user_id, resource_id)] |= mask
+    return dict(bits)
+
+
+def refresh(user_ids: Iterable[int], resource_ids: Optional[Iterable[int]] = None, publish: bool = True) -> None:
+    """Пересчитывает строки пользователей (только по resource_ids, если заданы).
+
+    Заодно пересобирает общий снимок политики после коммита (publish): refresh() — точка,
+    через которую проходят и записи в обход сигналов. Сигналам это не нужно, они
+    планируют пересборку сами.
+    """
+    user_ids = sorted(set(user_ids))
+    resource_ids = None if resource_ids is None else list(resource_ids)
+    for i in range(0, len(user_ids), CHUNK_USERS):
+        chunk = user_ids[i:i + CHUNK_USERS]
+        with transaction.atomic():
+            # блокировки в порядке id; расчёт — уже под ними, иначе последним запишется устаревший снимок
+            list(User.objects.select_for_update().filter(id__in=chunk).order_by("id").values_list("id", flat=True))
+            bits = compute(chunk, resource_ids)
+            stale = EffectivePermission.objects.filter(user_id__in=chunk)
+            if resource_ids is not None:
+                stale = stale.filter(resource_id__in=resource_ids)
+            stale.delete()
+            # upsert: параллельный refresh того же пользователя мог уже вставить строку
+            EffectivePermission.objects.bulk_create(
+                [EffectivePermission(user_id=u, resource_id=r, bits=b) for (u, r), b in bits.items()],
+                update_conflicts=True, unique_fields=["user", "resource"], update_fields=["bits"],
+            )
+    if publish:
+        policy_store.schedule_publish()
+
+
+def rebuild() -> int:
+    """Полная пересборка таблицы; возвращает число строк."""
+    bits = compute()
+    with transaction.atomic():
+        EffectivePermission.objects.all().delete()
+        EffectivePermission.objects.bulk_create(
+            [EffectivePermission(user_id=u, resource_id=r, bits=b) for (u, r), b in bits.items()],
+            batch_size=5000,
+        )
+    policy_store.schedule_publish()
+    return len(bits)
+
+
+def verify() -> Dict[str, List[Tuple[int, int]]]:
+    """Расхождения таблицы с UserRole × PermissionRule: missing / extra / mismatched."""
+    expected = compute()
+    actual = {(u, r): b for u, r, b in EffectivePermission.objects.values_list("user_id", "resource_id", "bits")}
+    return {
+        "missing": sorted(k for k in expected.keys() - actual.keys()),
+        "extra": sorted(k for k in actual.keys() - expected.keys()),
+        "mismatched": sorted(k for k in expected.keys() & actual.keys() if expected[k] != actual[k]),
+    }
+
+
+def _remember_previous(sender, instance=None, raw=False, **kwargs) -> None:
+    # смена user/role/resource у существующей строки: старую комбинацию тоже пересчитать
+    if raw or instance is None or instance.pk is None:
+        return
+    fields = ("user_id", "role_id") if sender is UserRole else ("role_id", "resource_id")
+    instance._rbac_previous = sender.objects.filter(pk=instance.pk).values(*fields).first()
+
+
+def _on_user_role_change(sender, instance=None, raw=False, **kwargs) -> None:
+    if raw or instance is None:
+        return
+    previous = getattr(instance, "_rbac_previous", None) or {}
+    refresh({instance.user_id, previous.get("user_id", instance.user_id)}, publish=False)
+
+
+def _on_rule_change(sender, instance=None, raw=False, **kwargs) -> None:
+    if raw or instance is None:
+        return
+    pairs = {(instance.role_id, instance.resource_id)}
+    previous = getattr(instance, "_rbac_previous", None)
+    if previous:
+        pairs.add((previous["role_id"], previous["resource_id"]))
+    for role_id, resource_id in pairs:
+        user_ids = UserRole.objects.filter(role_id=role_id).values_list("user_id", flat=True).order_by()
+        refresh(user_ids, [resource_id], publish=False)
@@ -10,9 +10,10 @@ def load():
     res_users, _ = Resource.objects.get_or_create(code="users", defaults={"description": "Пользователи"})
     res_rbac, _ = Resource.objects.get_or_create(code="rbac.rules", defaults={"description": "Управление правилами"})
     res_orders, _ = Resource.objects.get_or_create(code="orders", defaults={"description": "Заказы (mock)"})
+    res_products, _ = Resource.objects.get_or_create(code="products", defaults={"description": "Товары"})
 
     # права админа на все
-    for r in (res_users, res_rbac, res_orders):
+    for r in (res_users, res_rbac, res_orders, res_products):
         PermissionRule.objects.get_or_create(
             role=admin, resource=r,
             defaults=dict(read=True, read_all=True, create=True, update=True, update_all=True, delete=True, delete_all=True)
@@ -37,3 +38,10 @@ def load():
         role=user, resource=res_orders,
         defaults=dict(read=True, read_all=False, create=True, update=True, update_all=False, delete=True, delete_all=False)
     )
+
+    # каталог товаров виден всем: заказ можно оформить только на товар, который пользователь может читать
+    for role in (manager, user):
+        PermissionRule.objects.get_or_create(
+            role=role, resource=res_products,
+            defaults=dict(read=True, read_all=True, create=False, update=False, update_all=False, delete=False, delete_all=False)
+        )
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import permissions_engine
+from rbac import effective
+
+
+class Command(BaseCommand):
+    help = "Пересобирает EffectivePermission из UserRole × PermissionRule и сверяет результат"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--verify-only", action="store_true", help="только сверка, без пересборки")
+
+    def handle(self, *args, **options):
+        if not options["verify_only"]:
+            rows = effective.rebuild()
+            permissions_engine.reset_caches()
+            self.stdout.write(f"Rebuilt effective permissions: {rows} rows")
+        diff = effective.verify()
+        if any(diff.values()):
+            lines = [f"{kind}: {len(pairs)} {pairs[:10]}" for kind, pairs in diff.items() if pairs]
+            raise CommandError("Effective permissions are inconsistent:\n" + "\n".join(lines))
+        self.stdout.write(self.style.SUCCESS("Effective permissions consistent"))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from rbac.registry import declared, sync_resources
+
+
+class Command(BaseCommand):
+    help = "Создаёт Resource для всех rbac_resource, объявленных во view"
+
+    def handle(self, *args, **options):
+        created = sync_resources()
+        self.stdout.write(self.style.SUCCESS(f"Resources declared: {len(declared)}, created: {created}"))
@@ -0,0 +1,52 @@
+# Generated by Django 4.2.30 on 2026-10-19 12:52
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+FLAGS = ("read", "read_all", "create", "update", "update_all", "delete", "delete_all")
+
+
+def populate(apps, schema_editor):
+    UserRole = apps.get_model("rbac", "UserRole")
+    PermissionRule = apps.get_model("rbac", "PermissionRule")
+    EffectivePermission = apps.get_model("rbac", "EffectivePermission")
+    db = schema_editor.connection.alias
+    users_by_role = {}
+    for user_id, role_id in UserRole.objects.using(db).values_list("user_id", "role_id"):
+        users_by_role.setdefault(role_id, []).append(user_id)
+    bits = {}
+    for role_id, resource_id, *flags in PermissionRule.objects.using(db).values_list("role_id", "resource_id", *FLAGS):
+        mask = sum(1 << i for i, v in enumerate(flags) if v)
+        if not mask:
+            continue
+        for user_id in users_by_role.get(role_id, ()):
+            bits[(user_id, resource_id)] = bits.get((user_id, resource_id), 0) | mask
+    EffectivePermission.objects.using(db).bulk_create(
+        [EffectivePermission(user_id=u, resource_id=r, bits=b) for (u, r), b in bits.items()],
+        batch_size=5000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+        ('rbac', '0002_alter_userrole_user'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EffectivePermission',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bits', models.PositiveSmallIntegerField()),
+                ('resource', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='rbac.resource')),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='users.user')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='effectivepermission',
+            constraint=models.UniqueConstraint(fields=('user', 'resource'), name='rbac_effective_user_resource_uniq'),
+        ),
+        migrations.RunPython(populate, migrations.RunPython.noop),
+    ]
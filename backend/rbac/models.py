@@ -3,6 +3,9 @@ from django.db import models
 
 USER_FK = "users.User"
 
+# порядок задаёт номер бита в EffectivePermission.bits
+RULE_FLAGS = ("read", "read_all", "create", "update", "update_all", "delete", "delete_all")
+
 class Role(models.Model):
     name = models.CharField(max_length=64, unique=True)
     description = models.CharField(max_length=256, blank=True)
@@ -44,3 +47,25 @@ class UserRole(models.Model):
 
     def __str__(self):
         return f"{self.user_id}:{self.role.name}"
+
+class EffectivePermission(models.Model):
+    """OR правил всех ролей пользователя по ресурсу; поддерживается rbac.effective."""
+    user = models.ForeignKey(USER_FK, on_delete=models.CASCADE, related_name="+", db_index=False)
+    resource = models.ForeignKey(Resource, on_delete=models.CASCADE, related_name="+")
+    bits = models.PositiveSmallIntegerField()  # бит i — RULE_FLAGS[i]
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "resource"], name="rbac_effective_user_resource_uniq"),
+        ]
+
+    @staticmethod
+    def pack(flags) -> int:
+        return sum(1 << i for i, v in enumerate(flags) if v)
+
+    @staticmethod
+    def unpack(bits: int) -> dict:
+        return {name: bool(bits >> i & 1) for i, name in enumerate(RULE_FLAGS)}
+
+    def __str__(self):
+        return f"{self.user_id}:{self.resource_id}:{self.bits:07b}"
@@ -0,0 +1,87 @@
+# rbac/registry.py
+"""
+Реестр RBAC-ресурсов, объявленных во view через rbac_resource.
+
+collect() обходит URLconf (без обращения к БД) лениво — при первом sync_resources(),
+а не при загрузке приложения, чтобы migrate и прочие команды не импортировали все view.
+warmup() вызывается хуками gunicorn (gunicorn.conf.py) перед приёмом трафика, а не при импорте
+config.wsgi: досоздаёт недостающие Resource одним bulk_create и публикует общий снимок политики (core.policy_store), а если он выключен — загружает
+id ресурсов и матрицу правил в кеши permissions_engine.
+"""
+import logging
+from typing import Dict
+
+from django.conf import settings
+from django.db import connections
+from django.urls import URLPattern, URLResolver, get_resolver
+
+from core import permissions_engine, policy_store
+from .models import Resource
+
+logger = logging.getLogger(__name__)
+
+RBAC_WARMUP = bool(getattr(settings, "RBAC_WARMUP", True))
+# воркеры без preload стартуют почти одновременно: свежий снимок не пересобирается
+RBAC_POLICY_STORE_STARTUP_MAX_AGE = float(getattr(settings, "RBAC_POLICY_STORE_STARTUP_MAX_AGE", 30))
+
+# code -> имя view, которое его объявило
+declared: Dict[str, str] = {}
+
+
+def _view_class(callback):
+    return getattr(callback, "cls", None) or getattr(callback, "view_class", None)
+
+
+def _walk(patterns):
+    for p in patterns:
+        if isinstance(p, URLResolver):
+            yield from _walk(p.url_patterns)
+        elif isinstance(p, URLPattern):
+            yield p.callback
+
+
+def collect() -> Dict[str, str]:
+    found = {}
+    for callback in _walk(get_resolver().url_patterns):
+        cls = _view_class(callback)
+        code = getattr(cls, "rbac_resource", None)
+        if code:
+            found.setdefault(code, cls.__name__)
+    declared.clear()
+    declared.update(found)
+    return found
+
+
+def sync_resources() -> int:
+    """Создаёт Resource для объявленных кодов, которых ещё нет в БД."""
+    if not declared:
+        collect()
+    existing = set(Resource.objects.filter(code__in=declared).values_list("code", flat=True))
+    missing = [
+        Resource(code=code, description=f"auto: {view}")
+        for code, view in sorted(declared.items()) if code not in existing
+    ]
+    if missing:
+        Resource.objects.bulk_create(missing, ignore_conflicts=True)
+        logger.info("rbac registry: created resources %s", [r.code for r in missing])
+        # bulk_create идёт в обход сигналов
+        policy_store.schedule_publish()
+    return len(missing)
+
+
+def warmup() -> None:
+    """Вызывается из хуков gunicorn до приёма запросов; при недоступной БД воркер стартует холодным."""
+    if not RBAC_WARMUP:
+        return
+    try:
+        created = sync_resources()
+        if policy_store.RBAC_POLICY_STORE:
+            # общий снимок вместо копии матрицы в каждом процессе
+            policy_store.publish(max_age=None if created else RBAC_POLICY_STORE_STARTUP_MAX_AGE)
+        else:
+            permissions_engine.warm_caches()
+    except Exception:
+        logger.warning("rbac registry: warmup skipped", exc_info=True)
+    finally:
+        # соединение не должно переживать fork в preload-режиме gunicorn
+        connections.close_all()
@@ -1,5 +1,6 @@
 # rbac/serializers.py
 from rest_framework import serializers
+from core.permissions_engine import Action
 from .models import Role, Resource, PermissionRule, UserRole
 
 class RoleSerializer(serializers.ModelSerializer):
@@ -30,3 +31,44 @@ class UserRoleSerializer(serializers.ModelSerializer):
     class Meta:
         model = UserRole
         fields = ("id","user","role")
+
+class AccessCheckField(serializers.Field):
+    """[user_id, resource_code, action, owner_id]; owner_id можно опустить или передать null."""
+    default_error_messages = {"invalid": "Expected [user_id, resource_code, action, owner_id]."}
+
+    def to_internal_value(self, data):
+        # без вложенного Serializer на элемент: пакет может содержать тысячи проверок
+        if not isinstance(data, (list, tuple)) or len(data) not in (3, 4):
+            self.fail("invalid")
+        user_id, code, action = data[:3]
+        owner_id = data[3] if len(data) == 4 else None
+        if not isinstance(code, str):
+            self.fail("invalid")
+        try:
+            return _as_id(user_id), code, Action(action), (None if owner_id is None else _as_id(owner_id))
+        except (TypeError, ValueError):
+            self.fail("invalid")
+
+
+_ID_FIELD = serializers.IntegerField()
+
+
+def _as_id(value) -> int:
+    # правила IntegerField: true и 1.9 — не id, в отличие от голого int()
+    try:
+        return _ID_FIELD.to_internal_value(value)
+    except serializers.ValidationError:
+        raise ValueError(value) from None
+
+
+class AccessCheckSerializer(serializers.Serializer):
+    checks = serializers.ListField(child=AccessCheckField(), allow_empty=False)
+
+    def __init__(self, *args, max_items: int = 5000, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_items = max_items
+
+    def validate_checks(self, items):
+        if len(items) > self.max_items:
+            raise serializers.ValidationError(f"Too many checks in one batch (max {self.max_items}).")
+        return items
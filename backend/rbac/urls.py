@@ -1,6 +1,7 @@
 # rbac/urls.py
+from django.urls import path
 from rest_framework.routers import DefaultRouter
-from .views import RoleViewSet, ResourceViewSet, PermissionRuleViewSet, UserRoleViewSet
+from .views import RoleViewSet, ResourceViewSet, PermissionRuleViewSet, UserRoleViewSet, AccessCheckView
 
 router = DefaultRouter()
 router.register(r"roles", RoleViewSet, basename="rbac-roles")
@@ -8,4 +9,6 @@ router.register(r"resources", ResourceViewSet, basename="rbac-resources")
 router.register(r"rules", PermissionRuleViewSet, basename="rbac-rules")
 router.register(r"user-roles", UserRoleViewSet, basename="rbac-user-roles")
 
-urlpatterns = router.urls
+urlpatterns = router.urls + [
+    path("check", AccessCheckView.as_view(), name="rbac-check"),
+]
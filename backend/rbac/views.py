@@ -2,36 +2,56 @@
 from rest_framework import viewsets, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.views import APIView
+from django.conf import settings
 from django.db.models import Q
 
+from core import hot_queries
+from core.db_router import pinned
+from core.http_cache import ConditionalGetMixin
+from core.permissions_engine import check_batch
+from core.profiling import phase
 from .models import Role, Resource, PermissionRule, UserRole
-from .serializers import RoleSerializer, ResourceSerializer, PermissionRuleSerializer, UserRoleSerializer
+from .serializers import (
+    RoleSerializer, ResourceSerializer, PermissionRuleSerializer, UserRoleSerializer, AccessCheckSerializer,
+)
+
+RBAC_CHECK_MAX_ITEMS = int(getattr(settings, "RBAC_CHECK_MAX_ITEMS", 5000))
 
 def is_admin(user):
     if not user or not user.is_authenticated:
         return False
     if getattr(user, "is_staff", False):
         return True
-    return UserRole.objects.filter(user=user, role__name__iexact="admin").exists()
+    with pinned(f"rbac:user:{user.id}"):
+        return hot_queries.has_role(user.id, "admin")
 
 class AdminOnly(permissions.BasePermission):
     def has_permission(self, request, view):
-        return is_admin(request.user)
+        with phase("permissions"):
+            return is_admin(request.user)
+
+class AdminCachedViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
+    permission_classes = [AdminOnly]
 
-class RoleViewSet(viewsets.ModelViewSet):
+    def etag_scope(self, request) -> str:
+        # AdminOnly: все допущенные видят одно и то же
+        return "admin"
+
+class RoleViewSet(AdminCachedViewSet):
     queryset = Role.objects.all()
     serializer_class = RoleSerializer
-    permission_classes = [AdminOnly]
+    etag_models = (Role,)
 
-class ResourceViewSet(viewsets.ModelViewSet):
+class ResourceViewSet(AdminCachedViewSet):
     queryset = Resource.objects.all()
     serializer_class = ResourceSerializer
-    permission_classes = [AdminOnly]
+    etag_models = (Resource,)
 
-class PermissionRuleViewSet(viewsets.ModelViewSet):
+class PermissionRuleViewSet(AdminCachedViewSet):
     queryset = PermissionRule.objects.select_related("role","resource").all()
     serializer_class = PermissionRuleSerializer
-    permission_classes = [AdminOnly]
+    etag_models = (PermissionRule, Role, Resource)
 
     @action(detail=False, methods=["get"], permission_classes=[AdminOnly])
     def by_role(self, request):
@@ -43,10 +63,10 @@ class PermissionRuleViewSet(viewsets.ModelViewSet):
         ser = self.get_serializer(page or qs, many=True)
         return self.get_paginated_response(ser.data) if page is not None else Response(ser.data)
 
-class UserRoleViewSet(viewsets.ModelViewSet):
+class UserRoleViewSet(AdminCachedViewSet):
     queryset = UserRole.objects.select_related("role").all()
     serializer_class = UserRoleSerializer
-    permission_classes = [AdminOnly]
+    etag_models = (UserRole, Role)
 
     def get_queryset(self):
         qs = super().get_queryset()
@@ -58,3 +78,15 @@ class UserRoleViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         user_id = self.request.data.get("user_id")
         serializer.save(user_id=user_id)
+
+class AccessCheckView(APIView):
+    """Пакетные RBAC-решения для внутренних сервисов (сервисная учётка с ролью admin)."""
+    permission_classes = [AdminOnly]
+
+    def post(self, request):
+        serializer = AccessCheckSerializer(data=request.data, max_items=RBAC_CHECK_MAX_ITEMS)
+        serializer.is_valid(raise_exception=True)
+        with phase("permissions"):
+            decisions = check_batch(serializer.validated_data["checks"])
+        results = [{"allowed": d.allowed, "scope": d.scope.value if d.scope else None} for d in decisions]
+        return Response({"results": results})
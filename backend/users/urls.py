@@ -1,9 +1,10 @@
 from django.urls import path
-from .views import RegisterView, LoginView, LogoutView, ProfileView
+from .views import RegisterView, LoginView, RefreshView, LogoutView, ProfileView
 
 urlpatterns = [
     path("register/", RegisterView.as_view()),
     path("login/", LoginView.as_view()),
+    path("refresh/", RefreshView.as_view()),
     path("logout/", LogoutView.as_view()),
     path("me/", ProfileView.as_view()),
 ]
@@ -9,12 +9,16 @@ from .serializers import RegisterSerializer, UserSerializer
 from core.auth import (
     check_password,
     make_access_and_refresh,
+    rotate_refresh,
+    revoke_refresh,
+    AuthError,
     create_session,
     set_session_cookie,
     revoke_session,
     revoke_jwt,
 )
-from core.models import Session
+from core.db_router import mark_written
+from core.models import Session, RefreshFamily
 
 
 class RegisterView(APIView):
@@ -45,6 +49,21 @@ class LoginView(APIView):
         return response
 
 
+class RefreshView(APIView):
+    """Новая пара токенов по refresh-токену: без bcrypt и без новой Session."""
+    permission_classes = [permissions.AllowAny]
+
+    def post(self, request):
+        token = request.data.get("refresh") or ""
+        if not token:
+            return Response({"detail": "refresh required"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            access, refresh = rotate_refresh(token)
+        except AuthError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_401_UNAUTHORIZED)
+        return Response({"access": access, "refresh": refresh}, status=status.HTTP_200_OK)
+
+
 class LogoutView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
@@ -60,6 +79,9 @@ class LogoutView(APIView):
             exp = payload.get("exp")
             if jti and exp:
                 revoke_jwt(jti, exp)
+        refresh = request.data.get("refresh")
+        if refresh:
+            revoke_refresh(refresh)
         response = Response({"detail": "Logged out"}, status=status.HTTP_200_OK)
         response.delete_cookie(cookie_name)
         return response
@@ -77,6 +99,7 @@ class ProfileView(APIView):
         serializer = UserSerializer(request.user, data=payload, partial=True)
         serializer.is_valid(raise_exception=True)
         serializer.save()
+        mark_written(f"user:{request.user.id}")
         return Response(serializer.data)
 
     def delete(self, request):
@@ -84,6 +107,8 @@ class ProfileView(APIView):
         user.is_active = False
         user.save()
         Session.objects.filter(user=user).delete()
+        RefreshFamily.objects.filter(user=user).delete()
+        mark_written(f"user:{user.id}")
         response = Response({"detail": "Account deactivated"}, status=status.HTTP_200_OK)
         response.delete_cookie(getattr(settings, "SESSION_COOKIE_NAME", "sessionid"))
         return response